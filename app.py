@@ -1,12 +1,26 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context, g, send_file, abort
 from werkzeug.security import generate_password_hash, check_password_hash
-from models import db, User, Prediction
-from forms import SignUp, Login, Input
+from models import db, User, Prediction, STAR_TYPE_CODES, decode_input_data, configure_sqlite
+from migrations import upgrade
+from summary import rebuild_summaries, user_summary
+from forms import SignUp, Login, Input, ScoreFile, SCHEMA, STAR_COLORS, SPECTRAL_CLASSES, NUMERIC_RANGES, apply_schema
+from registry import ModelRegistry
+from schema import load_schema, served_schema_path
+from cache import PredictionCache
+from writebehind import PredictionWriter
+from metrics import METRICS, Profiler
+from jobs import ScoringJobs, SCORING_DIR
+from batch import (
+    BATCH_CHUNK_SIZE, CSV_FIELDS, UNCERTAINTY_FIELDS, format_output, read_json_chunks, read_csv_chunks, score_chunks, to_ndjson, to_csv,
+    validate_chunk
+)
+from joint import JointPredictor
+from microbatch import MicroBatcher, QueueFull
+from webcache import PageCache, StaticAssets
 from datetime import datetime
 from decimal import Decimal
 from pytz import timezone
 import pandas as pd
-import joblib
 import json
 import os
 
@@ -31,16 +45,11 @@ FEATURE_COLUMNS = [
     "absolute_magnitude",
 ]
 UNIQUE_VALUES = {
-    "star_color": ["Blue", "White", "Yellow", "Orange", "Red"],
-    "spectral_class": ["O", "B", "A", "F", "G", "K", "M"],
-    "star_type": ["Brown Dwarf", "Red Dwarf", "White Dwarf", "Main Sequence", "Supergiant", "Hypergiant"],
-}
-RANGES = {
-    "temperature": "Range [300, 50000]",
-    "radius": "Range (0, 1000]",
-    "luminosity": "Range [0, 1.0e+7]",
-    "absolute_magnitude": "Range [-12, 25]"
+    "star_color": STAR_COLORS,
+    "spectral_class": SPECTRAL_CLASSES,
+    "star_type": list(SCHEMA["categories"]["Star_Type"].values()),
 }
+RANGES = {feature: f"Range [{low:g}, {high:g}]" for feature, (low, high) in NUMERIC_RANGES.items()}
 FEATURE_MAP = {
     "star_color": "Star_Color",
     "spectral_class": "Spectral_Class",
@@ -54,43 +63,79 @@ FEATURE_MAP = {
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = "SmF5IGlzIGtpbmcgb2YgdGhlIHVuaXZlcnNlLiBIZSBpcyB1bmRlZmVhdGFibGUsIGV2ZW4gYnkgQWxpZW5zLg=="
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///users.db')
+app.config['MODEL_CACHE_SIZE'] = int(os.environ.get('MODEL_CACHE_SIZE', 0)) or None
+app.config['MODEL_MEMORY_BUDGET_MB'] = int(os.environ.get('MODEL_MEMORY_BUDGET_MB', 0)) or None
+app.config['MODEL_WARMUP'] = [key for key in os.environ.get('MODEL_WARMUP', '').split(',') if key]
+app.config['MODEL_WATCH_INTERVAL'] = float(os.environ.get('MODEL_WATCH_INTERVAL', 0))
+app.config['MODEL_CHECK_INTERVAL'] = float(os.environ.get('MODEL_CHECK_INTERVAL', 1.0))
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
+app.config['FAST_INFERENCE'] = os.environ.get('FAST_INFERENCE', '0') == '1'
+app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))
+app.config['PREDICTION_CACHE_TTL'] = int(os.environ.get('PREDICTION_CACHE_TTL', 0)) or None
+app.config['HISTORY_PAGE_SIZE'] = int(os.environ.get('HISTORY_PAGE_SIZE', 20))
+app.config['HISTORY_MAX_PAGE_SIZE'] = 100
+app.config['PREDICTION_CACHE_PLACES'] = int(os.environ['PREDICTION_CACHE_PLACES']) if os.environ.get('PREDICTION_CACHE_PLACES') else None
+app.config['PREDICTION_WRITE_BEHIND'] = os.environ.get('PREDICTION_WRITE_BEHIND', '0') == '1'
+app.config['PREDICTION_FLUSH_SIZE'] = int(os.environ.get('PREDICTION_FLUSH_SIZE', 100))
+app.config['PREDICTION_FLUSH_INTERVAL'] = float(os.environ.get('PREDICTION_FLUSH_INTERVAL', 1.0))
+app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE')  # e.g. WAL
+app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS')  # e.g. NORMAL, safe with WAL
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ['SQLITE_BUSY_TIMEOUT']) if os.environ.get('SQLITE_BUSY_TIMEOUT') else None
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.001))
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', 'profiles')
+app.config['PROFILE_KEEP'] = int(os.environ.get('PROFILE_KEEP', 200))
+# Storing uncertainty compiles the fast-path pipelines even with FAST_INFERENCE off, so it is opt-in (e.g. 0.9)
+app.config['PREDICTION_INTERVAL_LEVEL'] = float(os.environ.get('PREDICTION_INTERVAL_LEVEL', 0))
+app.config['MICRO_BATCH_WINDOW_MS'] = float(os.environ.get('MICRO_BATCH_WINDOW_MS', 0))
+app.config['MICRO_BATCH_MAX_SIZE'] = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 256))
+app.config['MICRO_BATCH_MAX_QUEUE'] = int(os.environ.get('MICRO_BATCH_MAX_QUEUE', 1024))
+app.config['INFERENCE_WORKERS'] = int(os.environ.get('INFERENCE_WORKERS', 2))
+app.config['JOINT_WORKERS'] = int(os.environ.get('JOINT_WORKERS', 4))
+app.config['JOINT_MAX_ROUNDS'] = 10
+app.config['SCORING_WORKERS'] = int(os.environ.get('SCORING_WORKERS', 2))
+app.config['SCORING_DIR'] = os.environ.get('SCORING_DIR', SCORING_DIR)
+app.config['PAGE_CACHE'] = os.environ.get('PAGE_CACHE', '1') == '1'
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 500)) * 1024 * 1024
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    key: int(os.environ[env]) for key, env in (('pool_size', 'DB_POOL_SIZE'), ('max_overflow', 'DB_MAX_OVERFLOW')) if os.environ.get(env)
+}
 
 db.init_app(app)
 with app.app_context():
+    configure_sqlite(
+        db.engine,
+        journal_mode=app.config['SQLITE_JOURNAL_MODE'],
+        synchronous=app.config['SQLITE_SYNCHRONOUS'],
+        busy_timeout=app.config['SQLITE_BUSY_TIMEOUT']
+    )
+    METRICS.count_queries(db.engine)
     db.create_all()
+    upgrade()
 
 
 def load_models():
-    model_dir = "models"
-    filenames = {
-        "absolute-magnitude": "absolute-magnitude-predictor.joblib",
-        "luminosity": "luminosity-predictor.joblib",
-        "radius": "radius-predictor.joblib",
-        "spectral-class": "spectral-class-predictor.joblib",
-        "star-color": "star-color-predictor.joblib",
-        "star-type": "star-type-predictor.joblib",
-        "temperature": "temperature-predictor.joblib",
-    }
-
-    models = {}
-
-    for key, filename in filenames.items():
-        full_path = os.path.join(model_dir, filename)
-        try:
-            model_tuple = joblib.load(full_path)
-            if isinstance(model_tuple, tuple) and len(model_tuple) == 2:
-                models[key] = {
-                    "model": model_tuple[0],
-                    "features": model_tuple[1]
-                }
-            else:
-                raise ValueError("Model file format invalid (expected tuple)")
-        except Exception as e:
-            print(f"[ERROR] Failed to load model for '{key}': {e}")
-            models[key] = None
+    registry = ModelRegistry()
+    return {key: registry.get(key) for key in registry.keys()}
+
+
+def history_filters():
+    filters = {}
+    for column in ("predicted_feature", "star_color", "spectral_class", "star_type"):
+        value = request.args.get(column)
+        if value:
+            filters[column] = value
+
+    if "star_type" in filters:
+        code = STAR_TYPE_CODES.get(filters["star_type"], filters["star_type"])
+        filters["star_type"] = int(code) if str(code).isdigit() else -1
+
+    return filters
+
 
-    return models
+def server_busy():
+    # Backpressure: clients should retry shortly instead of waiting behind a full inference queue
+    return Response("The server is busy, please try again in a moment.", status=503, headers={"Retry-After": "1"}, mimetype="text/plain")
 
 
 def convert_decimal(obj):
@@ -99,13 +144,108 @@ def convert_decimal(obj):
     return obj
 
 
-MODELS = load_models()
+MODELS = ModelRegistry(
+    max_models=app.config['MODEL_CACHE_SIZE'],
+    memory_budget=app.config['MODEL_MEMORY_BUDGET_MB'] * 1024 * 1024 if app.config['MODEL_MEMORY_BUDGET_MB'] else None,
+    compile=app.config['FAST_INFERENCE'],
+    check_interval=app.config['MODEL_CHECK_INTERVAL']
+)
+MODELS.warm_up(app.config['MODEL_WARMUP'], compiled=bool(app.config['PREDICTION_INTERVAL_LEVEL']))
+PREDICTIONS = PredictionCache(
+    max_entries=app.config['PREDICTION_CACHE_SIZE'],
+    ttl=app.config['PREDICTION_CACHE_TTL'],
+    quantize_places=app.config['PREDICTION_CACHE_PLACES']
+)
+PREDICTION_WRITER = PredictionWriter(
+    app,
+    enabled=app.config['PREDICTION_WRITE_BEHIND'],
+    flush_size=app.config['PREDICTION_FLUSH_SIZE'],
+    flush_interval=app.config['PREDICTION_FLUSH_INTERVAL']
+)
+MICRO_BATCHER = MicroBatcher(
+    window_ms=app.config['MICRO_BATCH_WINDOW_MS'],
+    max_batch=app.config['MICRO_BATCH_MAX_SIZE'],
+    max_queue=app.config['MICRO_BATCH_MAX_QUEUE'],
+    max_workers=app.config['INFERENCE_WORKERS'],
+    level=app.config['PREDICTION_INTERVAL_LEVEL']
+)
+JOINT = JointPredictor(MODELS, SCHEMA["columns"], SCHEMA["defaults"], max_workers=app.config['JOINT_WORKERS'])
+
+
+def reload_schema(release):
+    # A new release may have been trained on other categories; its schema is served together with its models
+    schema = load_schema(served_schema_path(MODELS.model_dir))
+    apply_schema(schema)
+    JOINT.columns, JOINT.defaults = list(schema["columns"]), dict(schema["defaults"])
+    print(f"[INFO] Loaded the schema of release '{release}'")
+
+
+MODELS.on_release(reload_schema)
+SCORING_JOBS = ScoringJobs(
+    app,
+    MODELS,
+    PREDICTION_WRITER,
+    job_dir=app.config['SCORING_DIR'],
+    max_workers=app.config['SCORING_WORKERS']
+)
+SCORING_JOBS.fail_interrupted()
+PROFILER = Profiler(
+    sample_rate=app.config['PROFILE_SAMPLE_RATE'],
+    output_dir=app.config['PROFILE_DIR'],
+    keep=app.config['PROFILE_KEEP'] or None
+)
+PAGES = PageCache(enabled=app.config['PAGE_CACHE'])
+STATIC_ASSETS = StaticAssets(app.static_folder)
+
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    # url_for('static', filename=...) gets ?v=<content hash>, so the file can be cached for good
+    if endpoint == "static" and "v" not in values:
+        fingerprint = STATIC_ASSETS.fingerprint(values.get("filename", ""))
+        if fingerprint:
+            values["v"] = fingerprint
+
+
+def static_file(filename):
+    return STATIC_ASSETS.response(request, filename)
+
+
+app.view_functions["static"] = static_file
+
+
+def cached_page(template, **context):
+    # These pages only change with the login state; a page showing flashed messages is rendered normally, once
+    if session.get("_flashes"):
+        return render_template(template, **context)
+    key = (request.endpoint, bool(session.get('user_id')))
+    return PAGES.render(request, key, lambda: render_template(template, **context))
+
+
+@app.before_request
+def start_model_watcher():
+    # Not started at import: under Gunicorn that is the master, which never serves requests. Gunicorn workers
+    # start it in post_fork, any other server in the process handling its first request
+    if app.config['MODEL_WATCH_INTERVAL']:
+        MODELS.watch(app.config['MODEL_WATCH_INTERVAL'])
+
+
+@app.before_request
+def start_profile():
+    g.profile = PROFILER.start()
+
+
+@app.teardown_request
+def stop_profile(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        PROFILER.stop(profile, request.endpoint or "unknown")
 
 
 @app.route("/")
 @app.route("/home")
 def home():
-    return render_template('index.html', title="Star Feature Predictor")
+    return cached_page('index.html', title="Star Feature Predictor")
 
 
 @app.route("/sign_up", methods=['GET', 'POST'])
@@ -181,12 +321,12 @@ def logout():
 
 @app.route("/about")
 def about():
-    return render_template('about.html', title="About  | Star Feature Predictor")
+    return cached_page('about.html', title="About  | Star Feature Predictor")
 
 
 @app.route("/prediction_options")
 def prediction_options():
-    return render_template('prediction_options.html', title="Prediction Options  | Star Feature Predictor")
+    return cached_page('prediction_options.html', title="Prediction Options  | Star Feature Predictor")
 
 
 @app.route("/predict", methods=['GET', 'POST'])
@@ -210,7 +350,11 @@ def predict():
             return redirect(url_for("prediction_options"))
 
         model = model_entry["model"]
+        compiled_model = model_entry.get("compiled")
         expected_features = model_entry["features"]
+        # The fast path computes the prediction and its uncertainty in one pass over the trees
+        if app.config['PREDICTION_INTERVAL_LEVEL'] and compiled_model is None:
+            compiled_model = MODELS.compiled(target.replace("_", "-").lower(), model_entry)
 
     except Exception as e:
         print(f"Model loading error: {e}")
@@ -220,7 +364,10 @@ def predict():
     if target in form._fields:  # Remove field being predicted
         del form._fields[target]
 
-    if form.validate_on_submit():
+    with METRICS.time("predict", "form_validation", target):
+        submitted = form.validate_on_submit()
+
+    if submitted:
         try:
             input_data = {
                 "Star_Color": form.star_color.data,
@@ -233,8 +380,28 @@ def predict():
             }
 
             input_data.pop(FEATURE_MAP[target], None)
-            input_df = pd.DataFrame([input_data])[expected_features]
-            prediction = model.predict(input_df)[0]
+            model_input = PREDICTIONS.canonicalize(input_data)
+            cache_key = PREDICTIONS.key(target, model_entry["version"], model_input)
+            # Cached as a dict: the prediction and, when computed, its uncertainty
+            output = PREDICTIONS.get(cache_key)
+
+            if output is None:
+                if MICRO_BATCHER.enabled:
+                    with METRICS.time("predict", "model_predict", target):
+                        output = MICRO_BATCHER.predict(target, model_entry, model_input)
+                elif compiled_model is not None and app.config['PREDICTION_INTERVAL_LEVEL']:
+                    with METRICS.time("predict", "model_predict", target):
+                        output = compiled_model.uncertainty([model_input], app.config['PREDICTION_INTERVAL_LEVEL'])[0]
+                elif compiled_model is not None:
+                    with METRICS.time("predict", "model_predict", target):
+                        output = {"prediction": compiled_model.predict_one(model_input)}
+                else:
+                    with METRICS.time("predict", "dataframe", target):
+                        input_df = pd.DataFrame([model_input])[expected_features]
+                    with METRICS.time("predict", "model_predict", target):
+                        output = {"prediction": model.predict(input_df)[0]}
+                PREDICTIONS.set(cache_key, output)
+            prediction = output["prediction"]
 
             if isinstance(prediction, Decimal):
                 prediction = float(prediction)
@@ -250,30 +417,258 @@ def predict():
                 user_id=session['user_id'],
                 input_data=json.dumps(input_data, default=convert_decimal),
                 predicted_feature=target.replace("_", " ").title(),
-                prediction = prediction if target != "star_type" else STAR_TYPES.get(prediction, prediction)
+                prediction = prediction if target != "star_type" else STAR_TYPES.get(prediction, prediction),
+                model_version=model_entry["version"]
             )
-            db.session.add(new_prediction)
-            db.session.commit()
+            new_prediction.set_features(input_data, prediction)
+            new_prediction.set_uncertainty(format_output(target.replace("_", "-").lower(), output))
+            with METRICS.time("predict", "db_commit", target):
+                PREDICTION_WRITER.add(new_prediction)
 
             return redirect(url_for('past_predictions', target=target, model_prediction=prediction))
 
+        except QueueFull:
+            return server_busy()
+
         except Exception as e:
             print(f"Error during prediction:\n{e}")
             flash("Something went wrong during prediction. Please try again.", "danger")
             return redirect(url_for('predict', target=target))
 
+    with METRICS.time("predict", "render", target):
+        return render_template(
+            "predict.html",
+            title="Predict | Star Feature Predictor",
+            columns=FEATURE_COLUMNS,
+            categorical_columns=CATEGORICAL_COLUMNS,
+            unique_values=UNIQUE_VALUES,
+            ranges=RANGES,
+            target=target,
+            form=form
+        )
+
+
+@app.route("/api/predict/<target>", methods=['POST'])
+def api_predict(target):
+    if 'user_id' not in session:
+        return jsonify(error="You need to log in first to make predictions."), 401
+
+    target = target.replace("_", "-").lower()
+    model_entry = MODELS.get(target)
+
+    if not model_entry:
+        return jsonify(error=f"Model for '{target}' not found or failed to load."), 404
+
+    chunk_size = request.args.get("chunk_size", BATCH_CHUNK_SIZE, type=int)
+    output_format = request.args.get("format", "ndjson").lower()
+    level = request.args.get("level", app.config['PREDICTION_INTERVAL_LEVEL'] or 0.9, type=float)
+
+    if chunk_size <= 0:
+        return jsonify(error="'chunk_size' must be a positive integer."), 400
+
+    if output_format not in ("ndjson", "csv"):
+        return jsonify(error="'format' must be either 'ndjson' or 'csv'."), 400
+
+    # ?uncertainty=1 adds interval / class probabilities and the inter-tree spread of every prediction
+    uncertainty = None
+    if request.args.get("uncertainty", "0") == "1":
+        if not 0 < level < 1:
+            return jsonify(error="'level' must be between 0 and 1."), 400
+        compiled = MODELS.compiled(target, model_entry)
+        if compiled is None:
+            return jsonify(error=f"Uncertainty is not available for the '{target}' model."), 501
+        uncertainty = (compiled, level)
+
+    try:
+        if request.mimetype == "text/csv":
+            chunks = read_csv_chunks(request.stream, chunk_size)
+        else:
+            payload = request.get_json(silent=True)
+            if payload is None:
+                return jsonify(error="Request body must be JSON or CSV (Content-Type: text/csv)."), 400
+            chunks = read_json_chunks(payload, chunk_size)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    batches = score_chunks(model_entry["model"], model_entry["features"], target, chunks, uncertainty)
+
+    if output_format == "csv":
+        fieldnames = CSV_FIELDS[:-1] + UNCERTAINTY_FIELDS + CSV_FIELDS[-1:] if uncertainty else CSV_FIELDS
+        return Response(stream_with_context(to_csv(batches, fieldnames)), mimetype="text/csv")
+
+    return Response(stream_with_context(to_ndjson(batches)), mimetype="application/x-ndjson")
+
+
+@app.route("/api/predict_missing", methods=['POST'])
+def api_predict_missing():
+    if 'user_id' not in session:
+        return jsonify(error="You need to log in first to make predictions."), 401
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Request body must be a JSON object of the known features."), 400
+
+    rounds = request.args.get("rounds", 1, type=int)
+    chained = request.args.get("chained", "0") == "1"
+    if not 1 <= rounds <= app.config['JOINT_MAX_ROUNDS']:
+        return jsonify(error=f"'rounds' must be between 1 and {app.config['JOINT_MAX_ROUNDS']}."), 400
+
+    # Accept both form field names ("star_color") and training column names ("Star_Color"), like the batch API
+    payload = {str(key).strip().lower(): value for key, value in payload.items() if value not in (None, "")}
+    known_columns = [column for column in SCHEMA["columns"] if column.lower() in payload]
+    if not known_columns:
+        return jsonify(error="Give at least one known feature."), 400
+
+    X, errors = validate_chunk(pd.DataFrame([payload]), known_columns)
+    if len(errors):
+        return jsonify(error=errors.iloc[0]), 400
+
+    known = {column: value.item() if hasattr(value, "item") else value for column, value in X.iloc[0].items()}
+    try:
+        with METRICS.time("predict_missing", "model_predict"):
+            predictions, versions = JOINT.predict(known, rounds=rounds, chained=chained)
+    except LookupError as e:
+        return jsonify(error=str(e)), 404
+
+    input_data = dict(known)
+    if "Star_Type" in input_data:
+        input_data["Star_Type"] = STAR_TYPES.get(input_data["Star_Type"], input_data["Star_Type"])
+
+    results = {}
+    for column, prediction in predictions.items():
+        value = STAR_TYPES.get(prediction, prediction) if column == "Star_Type" else prediction
+        results[column] = value
+
+        new_prediction = Prediction(
+            prediction_time=datetime.now(IST),
+            user_id=session['user_id'],
+            input_data=json.dumps(input_data),
+            predicted_feature=column.replace("_", " "),
+            prediction=value,
+            model_version=versions[column]
+        )
+        new_prediction.set_features(input_data, prediction)
+        PREDICTION_WRITER.add(new_prediction)
+
+    return jsonify(known=input_data, predictions=results, model_versions=versions, rounds=rounds, chained=chained)
+
+
+@app.route("/score_file", methods=['GET', 'POST'])
+def score_file():
+    if 'user_id' not in session:
+        flash("You need to log in first to score a file.", "warning")
+        return redirect(url_for('login', next=request.full_path))
+
+    form = ScoreFile()
+    if form.validate_on_submit():
+        target = form.target.data.replace("_", "-")
+        job_id = SCORING_JOBS.submit(session['user_id'], target, form.file.data)
+        flash("Your file is being scored, this page shows its progress.", "info")
+        return redirect(url_for('score_job', job_id=job_id))
+
     return render_template(
-        "predict.html",
-        title="Predict | Star Feature Predictor",
-        columns=FEATURE_COLUMNS,
-        categorical_columns=CATEGORICAL_COLUMNS,
-        unique_values=UNIQUE_VALUES,
-        ranges=RANGES,
-        target=target,
-        form=form
+        'score_file.html',
+        title="Score File | Star Feature Predictor",
+        form=form,
+        columns=SCHEMA["columns"]
     )
 
 
+def find_score_job(job_id):
+    try:
+        return SCORING_JOBS.get(job_id, session['user_id'])
+    except ValueError:
+        return None
+
+
+@app.route("/score_file/<job_id>")
+def score_job(job_id):
+    if 'user_id' not in session:
+        flash("Please log in to view your scoring jobs.", "warning")
+        return redirect(url_for('login'))
+
+    job = find_score_job(job_id)
+    if job is None:
+        flash("Scoring job not found or you don't have permission to view it.", "danger")
+        return redirect(url_for('score_file'))
+
+    return render_template('score_job.html', title="Scoring File | Star Feature Predictor", job=job)
+
+
+@app.route("/api/score_jobs/<job_id>")
+def api_score_job(job_id):
+    if 'user_id' not in session:
+        return jsonify(error="Please log in to view your scoring jobs."), 401
+
+    job = find_score_job(job_id)
+    if job is None:
+        return jsonify(error="Scoring job not found."), 404
+
+    return jsonify(job)
+
+
+@app.route("/score_file/<job_id>/download")
+def download_score_job(job_id):
+    if 'user_id' not in session:
+        flash("Please log in to download your results.", "warning")
+        return redirect(url_for('login'))
+
+    job = find_score_job(job_id)
+    if job is None or job["status"] != "finished":
+        abort(404)
+
+    download_name = f"{os.path.splitext(job['filename'])[0]}-{job['target']}-predictions.csv"
+    return send_file(os.path.abspath(SCORING_JOBS.path(job_id, "results.csv")), mimetype="text/csv", as_attachment=True, download_name=download_name)
+
+
+@app.route("/api/models")
+def api_models():
+    if 'user_id' not in session:
+        return jsonify(error="Please log in to view model statistics."), 401
+
+    return jsonify(
+        models=MODELS.stats(),
+        resident_bytes=MODELS.resident_bytes(),
+        prediction_cache=PREDICTIONS.stats(),
+        prediction_writer=PREDICTION_WRITER.stats()
+    )
+
+
+@app.route("/admin/reload_models", methods=['POST'])
+def reload_models():
+    # Disabled unless ADMIN_TOKEN is set; e.g. curl -X POST -H "X-Admin-Token: ..." /admin/reload_models
+    token = app.config['ADMIN_TOKEN']
+    if not token or request.headers.get('X-Admin-Token') != token:
+        return jsonify(error="Not allowed."), 403
+
+    swapped = MODELS.reload()
+    return jsonify(release=MODELS.release(), swapped=swapped, models={key: MODELS.version(key) for key in MODELS.keys()})
+
+
+@app.route("/metrics")
+def metrics():
+    gauges = []
+    for key, stats in MODELS.stats().items():
+        labels = {"model": key}
+        gauges += [
+            ("star_model_loaded", labels, stats["loaded"]),
+            ("star_model_load_seconds", labels, stats["load_seconds"]),
+            ("star_model_size_bytes", labels, stats["size_bytes"]),
+            ("star_model_loads", labels, stats["loads"]),
+        ]
+    gauges.append(("star_model_resident_bytes", {}, MODELS.resident_bytes()))
+    for name, value in PREDICTIONS.stats().items():
+        gauges.append((f"star_prediction_cache_{name}", {}, value))
+    for name, value in PREDICTION_WRITER.stats().items():
+        gauges.append((f"star_prediction_writer_{name}", {}, value))
+    for name, value in MICRO_BATCHER.stats().items():
+        gauges.append((f"star_microbatch_{name}", {}, value))
+    for name, value in PAGES.stats().items():
+        gauges.append((f"star_page_cache_{name}", {}, value))
+
+    return Response(METRICS.render(gauges), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/history")
 @app.route("/past_predictions")
 def past_predictions():
@@ -283,29 +678,106 @@ def past_predictions():
 
     target = request.args.get('target')
     model_prediction = request.args.get('model_prediction')
+    before = request.args.get('before')
+    page_size = request.args.get('page_size', app.config['HISTORY_PAGE_SIZE'], type=int)
+    page_size = max(1, min(page_size, app.config['HISTORY_MAX_PAGE_SIZE']))
 
-    if target.lower() not in CATEGORICAL_COLUMNS:
+    if target and target.lower() not in CATEGORICAL_COLUMNS:
         try:
             model_prediction = float(model_prediction)
         except (ValueError, TypeError):
             model_prediction = None
 
-    flash("You can see your past predictions here.", "info")
+    if not before:
+        flash("You can see your past predictions here.", "info")
 
-    user_predictions = Prediction.query.filter_by(user_id=session['user_id']).order_by(Prediction.prediction_time.desc()).all()
+    # Rows still waiting in the write-behind queue must show up in the user's own history
+    PREDICTION_WRITER.flush()
+    filters = history_filters()
+    query = Prediction.query.filter_by(user_id=session['user_id'], **filters)
 
-    for prediction in user_predictions:
+    # Keyset pagination: `before` is the (prediction_time, id) of the last row on the previous page
+    if before:
         try:
-            if isinstance(prediction.input_data, str):
-                prediction.input_data = json.loads(prediction.input_data.replace("'", '"'))
-            elif isinstance(prediction.input_data, dict):
-                prediction.input_data = json.dumps(prediction.input_data)
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON for prediction {prediction.id}: {e}")
-            flash(f"Error decoding data for prediction {prediction.id}.", "danger")
-            continue
+            before_time, before_id = before.rsplit("|", 1)
+            before_time, before_id = datetime.fromisoformat(before_time), int(before_id)
+        except ValueError:
+            flash("Invalid page requested, showing your latest predictions.", "warning")
+            return redirect(url_for('past_predictions', page_size=page_size, **filters))
+
+        query = query.filter(db.or_(
+            Prediction.prediction_time < before_time,
+            db.and_(Prediction.prediction_time == before_time, Prediction.id < before_id)
+        ))
+
+    with METRICS.time("past_predictions", "query"):
+        user_predictions = query.order_by(Prediction.prediction_time.desc(), Prediction.id.desc()).limit(page_size + 1).all()
+    next_cursor = None
+
+    if len(user_predictions) > page_size:
+        user_predictions = user_predictions[:page_size]
+        last = user_predictions[-1]
+        next_cursor = f"{last.prediction_time.isoformat()}|{last.id}"
+
+    # Only the rows on this page are decoded
+    with METRICS.time("past_predictions", "decode"):
+        for prediction in user_predictions:
+            try:
+                prediction.inputs = decode_input_data(prediction.input_data)
+            except json.JSONDecodeError as e:
+                print(f"Error decoding JSON for prediction {prediction.id}: {e}")
+                flash(f"Error decoding data for prediction {prediction.id}.", "danger")
+                prediction.inputs = {}
+
+    # The header comes from the incrementally maintained summary, not from the user's whole history
+    with METRICS.time("past_predictions", "summary"):
+        summary = user_summary(session['user_id'])
+
+    with METRICS.time("past_predictions", "render"):
+        return render_template(
+            'past_predictions.html',
+            title="Past Predictions | Star Feature Predictor",
+            predictions=user_predictions,
+            target=target,
+            model_prediction=model_prediction,
+            next_cursor=next_cursor,
+            is_first_page=not before,
+            page_size=page_size,
+            filters=filters,
+            feature_names=[feature.replace("_", " ").title() for feature in FEATURE_COLUMNS],
+            unique_values=UNIQUE_VALUES,
+            summary=summary
+        )
+
+
+@app.route("/api/history/summary")
+def history_summary():
+    if 'user_id' not in session:
+        return jsonify(error="Please log in to view your past predictions."), 401
+
+    PREDICTION_WRITER.flush()
+    return jsonify(user_summary(session['user_id']))
+
 
-    return render_template('past_predictions.html', title="Past Predictions | Star Feature Predictor", predictions=user_predictions, target=target, model_prediction=model_prediction)
+@app.route("/api/history/stats")
+def history_stats():
+    if 'user_id' not in session:
+        return jsonify(error="Please log in to view your past predictions."), 401
+
+    # e.g. /api/history/stats?predicted_feature=Temperature&spectral_class=M
+    PREDICTION_WRITER.flush()
+    filters = history_filters()
+    numeric_columns = [Prediction.temperature, Prediction.radius, Prediction.luminosity, Prediction.absolute_magnitude]
+    aggregates = [db.func.count(Prediction.id)]
+    for column in numeric_columns:
+        aggregates += [db.func.avg(column), db.func.min(column), db.func.max(column)]
+
+    row = db.session.query(*aggregates).filter_by(user_id=session['user_id'], **filters).one()
+    stats = {"count": row[0], "filters": filters}
+    for i, column in enumerate(numeric_columns):
+        stats[column.key] = {"avg": row[1 + 3 * i], "min": row[2 + 3 * i], "max": row[3 + 3 * i]}
+
+    return jsonify(stats)
 
 
 @app.route("/delete")
@@ -315,6 +787,7 @@ def delete_prediction(prediction_id):
         flash("Please log in to delete your predictions.", "warning")
         return redirect(url_for('login'))
 
+    PREDICTION_WRITER.flush()
     prediction = Prediction.query.filter_by(id=prediction_id, user_id=session['user_id']).first()
 
     if prediction:
@@ -327,6 +800,44 @@ def delete_prediction(prediction_id):
     return redirect(url_for('past_predictions'))
 
 
+@app.route("/api/history/delete", methods=["POST"])
+def delete_predictions():
+    if 'user_id' not in session:
+        return jsonify(error="Please log in to delete your predictions."), 401
+
+    # e.g. {"ids": [1, 2, 3]}, {"after": "2024-01-01", "before": "2024-07-01"} or {"target": "temperature"}; criteria are combined
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify(error="Request body must be a JSON object."), 400
+
+    conditions = []
+    try:
+        if payload.get("ids") is not None:
+            conditions.append(Prediction.id.in_([int(prediction_id) for prediction_id in payload["ids"]]))
+        if payload.get("after"):
+            conditions.append(Prediction.prediction_time >= datetime.fromisoformat(payload["after"]))
+        if payload.get("before"):
+            conditions.append(Prediction.prediction_time < datetime.fromisoformat(payload["before"]))
+    except (TypeError, ValueError):
+        return jsonify(error="'ids' must be a list of integers and 'after'/'before' ISO dates."), 400
+    if payload.get("target"):
+        # Model keys ("star-type") and feature names ("Star_Type") both name the stored "Star Type"
+        target = str(payload["target"]).replace("_", "-").lower()
+        if target not in MODELS:
+            return jsonify(error=f"Unknown target '{payload['target']}'."), 400
+        conditions.append(Prediction.predicted_feature == target.replace("-", " ").title())
+
+    if not conditions:
+        return jsonify(error="Give 'ids', 'after', 'before' or 'target'."), 400
+
+    PREDICTION_WRITER.flush()
+    # One DELETE statement; the summaries of the user are rebuilt in the same transaction
+    deleted = Prediction.query.filter(Prediction.user_id == session['user_id'], *conditions).delete(synchronize_session=False)
+    rebuild_summaries([session['user_id']])
+
+    return jsonify(deleted=deleted)
+
+
 if __name__ == '__main__':
     app.run(debug=True)
     
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""
+    ASGI serving mode:  uvicorn asgi:asgi_app --workers 4
+
+    The Flask app runs on a bounded pool of `ASGI_THREADS` threads, so a slow `model.predict` or SQLite commit
+    occupies one pool thread instead of a whole worker process. With `MICRO_BATCH_WINDOW_MS` set, concurrent
+    /predict requests are scored together in one vectorized call (see microbatch.py). Once `ASGI_MAX_IN_FLIGHT`
+    requests are being served, new ones are answered with 503 straight from the event loop.
+
+"""
+
+import os
+from a2wsgi import WSGIMiddleware
+from app import app
+
+
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 16))
+ASGI_MAX_IN_FLIGHT = int(os.environ.get("ASGI_MAX_IN_FLIGHT", 256))
+
+
+class InFlightLimit:
+    def __init__(self, app, max_in_flight):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # Single-threaded event loop, so the counter needs no lock
+        if self.in_flight >= self.max_in_flight:
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"content-type", b"text/plain"), (b"retry-after", b"1")],
+            })
+            await send({"type": "http.response.body", "body": b"The server is busy, please try again in a moment."})
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+
+asgi_app = InFlightLimit(WSGIMiddleware(app, workers=ASGI_THREADS), ASGI_MAX_IN_FLIGHT)
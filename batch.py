@@ -0,0 +1,142 @@
+"""
+    Helpers for the batch prediction API: reading rows from JSON or CSV,
+    validating them with the same ranges as `forms.Input` and scoring them chunk by chunk.
+
+"""
+
+import csv
+import io
+import json
+import pandas as pd
+from forms import NUMERIC_RANGES, STAR_COLORS, SPECTRAL_CLASSES, STAR_TYPES
+
+
+BATCH_CHUNK_SIZE = 5000
+CSV_FIELDS = ["row", "prediction", "error"]
+# Extra output of score_chunks with `uncertainty`
+UNCERTAINTY_FIELDS = ["confidence", "std", "lower", "upper", "level", "probabilities"]
+CATEGORY_CHOICES = {
+    "star_color": STAR_COLORS,
+    "spectral_class": SPECTRAL_CLASSES,
+}
+STAR_TYPE_CODES = {
+    **{str(code): code for code in STAR_TYPES},
+    **{name.lower(): code for code, name in STAR_TYPES.items()},
+}
+
+
+def read_json_chunks(payload, chunk_size=BATCH_CHUNK_SIZE):
+    rows = payload.get("rows") if isinstance(payload, dict) else payload
+
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ValueError('Expected a JSON list of objects or {"rows": [...]}.')
+
+    return (_json_chunk(rows, start, chunk_size) for start in range(0, len(rows), chunk_size))
+
+
+def _json_chunk(rows, start, chunk_size):
+    # Rows may mix naming styles, so keys are normalized per row before building the frame
+    records = [{str(key).strip().lower(): value for key, value in row.items()} for row in rows[start:start + chunk_size]]
+    return pd.DataFrame.from_records(records, index=range(start, start + len(records)))
+
+
+def read_csv_chunks(stream, chunk_size=BATCH_CHUNK_SIZE):
+    # Header is parsed here, so malformed files fail before the response starts streaming
+    return pd.read_csv(stream, chunksize=chunk_size, dtype=str, skipinitialspace=True)
+
+
+def validate_chunk(chunk, features):
+    # Accept both form field names ("star_color") and training column names ("Star_Color")
+    chunk = chunk.rename(columns=lambda col: str(col).strip().lower())
+    X = pd.DataFrame(index=chunk.index)
+    errors = pd.Series("", index=chunk.index, dtype=object)
+
+    for feature in features:
+        key = feature.lower()
+        if key not in chunk:
+            X[feature] = None
+            errors += f"missing '{key}'; "
+            continue
+
+        column = chunk[key]
+        if key in NUMERIC_RANGES:
+            low, high = NUMERIC_RANGES[key]
+            values = pd.to_numeric(column, errors="coerce")
+            invalid = values.isna() | (values < float(low)) | (values > float(high))
+            message = f"'{key}' must be between [{low}, {high}]; "
+        elif key == "star_type":
+            numeric = pd.to_numeric(column, errors="coerce")
+            values = column.astype(str).str.strip().str.lower().map(STAR_TYPE_CODES)
+            values = values.fillna(numeric.where(numeric.isin(list(STAR_TYPES))))
+            invalid = values.isna()
+            message = f"'{key}' must be one of {sorted(STAR_TYPES)} or a star type name; "
+        else:
+            values = column.astype(str).str.strip()
+            invalid = ~values.isin(CATEGORY_CHOICES[key])
+            message = f"'{key}' must be one of {CATEGORY_CHOICES[key]}; "
+
+        X[feature] = values
+        errors[invalid] = errors[invalid] + message
+
+    valid = errors == ""
+    X = X.loc[valid, features]
+    if "Star_Type" in X:
+        X["Star_Type"] = X["Star_Type"].astype(int)
+
+    return X, errors[~valid].str.rstrip("; ")
+
+
+def format_prediction(target, prediction):
+    if target == "star-type":
+        return STAR_TYPES.get(int(prediction), prediction)
+    return prediction
+
+
+def format_output(target, output):
+    output = dict(output, prediction=format_prediction(target, output["prediction"]))
+    if "probabilities" in output:
+        output["probabilities"] = {format_prediction(target, label): p for label, p in output["probabilities"].items()}
+    return output
+
+
+def score_chunks(model, features, target, chunks, uncertainty=None):
+    # One vectorized `predict` per chunk; invalid rows are reported in place instead of failing the batch.
+    # `uncertainty` is a (compiled pipeline, interval level) pair; its single pass also yields the predictions
+    for chunk in chunks:
+        X, errors = validate_chunk(chunk, features)
+        if not len(X):
+            outputs = []
+        elif uncertainty is not None:
+            compiled, level = uncertainty
+            outputs = compiled.uncertainty(X, level)
+        else:
+            outputs = [{"prediction": prediction} for prediction in model.predict(X).tolist()]
+        outputs = dict(zip(X.index, outputs))
+
+        results = []
+        for row in chunk.index:
+            if row in outputs:
+                results.append({"row": int(row), **format_output(target, outputs[row])})
+            else:
+                results.append({"row": int(row), "error": errors[row]})
+        yield results
+
+
+def to_ndjson(batches):
+    for results in batches:
+        yield "".join(json.dumps(result) + "\n" for result in results)
+
+
+def to_csv(batches, fieldnames=CSV_FIELDS):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+
+    for results in batches:
+        writer.writerows({key: json.dumps(value) if isinstance(value, dict) else value for key, value in result.items()} for result in results)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,232 @@
+"""
+    Benchmarks for the inference and web hot paths.
+
+    Measures cold model loading, `predict` of every pipeline at batch sizes 1 to 10k, the web flow
+    login -> /predict -> /past_predictions through the Flask test client with a synthetic history of N rows,
+    and a replay of the training CSV through the batch API. Results are written as JSON; with `--baseline`
+    every timing is compared to a previous run and the exit code is 1 when one regressed beyond `--threshold`.
+
+        python benchmark.py --output bench.json
+        python benchmark.py --baseline bench.json --threshold 0.2
+
+"""
+
+import os
+import sys
+import json
+import argparse
+import platform
+import tempfile
+from time import perf_counter
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+
+BATCH_SIZES = [1, 10, 100, 1000, 10_000]
+WEB_TARGET = "temperature"
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "benchmark-password"
+
+
+def timings_summary(timings):
+    timings = np.asarray(timings) * 1000
+    return {
+        "runs": len(timings),
+        "mean_ms": float(timings.mean()),
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+    }
+
+
+def time_calls(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+    return timings_summary(timings)
+
+
+def bench_models(df, model_dir, repeats):
+    from registry import ModelRegistry
+
+    results = {}
+    start = perf_counter()
+    registry = ModelRegistry(model_dir=model_dir)
+    entries = {key: registry.get(key) for key in registry.keys()}
+    results["load_models_seconds"] = perf_counter() - start
+    results["load"] = registry.stats()
+
+    results["predict"] = {}
+    for key, entry in entries.items():
+        if entry is None:
+            continue
+        model, features = entry["model"], entry["features"]
+        results["predict"][key] = {}
+        for batch_size in BATCH_SIZES:
+            X = df.iloc[:batch_size][features]
+            # Large batches take long enough that a few runs are representative
+            runs = max(3, repeats // max(1, batch_size // 100))
+            results["predict"][key][str(batch_size)] = time_calls(lambda: model.predict(X), runs)
+        print(f"[INFO] Benchmarked predict for '{key}'")
+
+    return results
+
+
+def seed_history(app, db, User, Prediction, rows):
+    from werkzeug.security import generate_password_hash
+    from summary import rebuild_summaries
+
+    with app.app_context():
+        user = User(name="Benchmark", username="benchmark", email=BENCH_EMAIL, password=generate_password_hash(BENCH_PASSWORD))
+        db.session.add(user)
+        db.session.commit()
+
+        now = datetime.now()
+        input_data = json.dumps({"Star_Color": "Red", "Spectral_Class": "M", "Star_Type": "Red Dwarf", "Radius": 0.5, "Luminosity": 0.01, "Absolute_Magnitude": 12.0})
+        mappings = [
+            {
+                "user_id": user.id,
+                "prediction_time": now - timedelta(seconds=i),
+                "input_data": input_data,
+                "predicted_feature": "Temperature",
+                "prediction": "3200.0",
+                "star_color": "Red",
+                "spectral_class": "M",
+                "star_type": 1,
+                "temperature": 3200.0,
+            }
+            for i in range(rows)
+        ]
+        db.session.bulk_insert_mappings(Prediction, mappings)
+        db.session.commit()
+        # Bulk inserts bypass the after_flush listener, so the summaries the history pages read are built here
+        rebuild_summaries([user.id])
+
+
+def bench_web(df, history_rows, repeats):
+    # The app binds its database at import, so it is pointed at a scratch file first
+    tmp_dir = tempfile.mkdtemp(prefix="star-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    # The same form is posted on every run; without this, all but the first would be prediction cache hits
+    os.environ["PREDICTION_CACHE_SIZE"] = "0"
+    from app import app, db, User, Prediction
+
+    app.config["WTF_CSRF_ENABLED"] = False
+    seed_history(app, db, User, Prediction, history_rows)
+    client = app.test_client()
+    results = {"history_rows": history_rows}
+
+    results["login"] = time_calls(
+        lambda: client.post("/login", data={"email": BENCH_EMAIL, "password": BENCH_PASSWORD}), max(3, repeats // 10)
+    )
+
+    row = df.iloc[0]
+    form = {
+        "star_color": row["Star_Color"],
+        "spectral_class": row["Spectral_Class"],
+        "star_type": str(row["Star_Type"]),
+        "radius": row["Radius"],
+        "luminosity": row["Luminosity"],
+        "absolute_magnitude": row["Absolute_Magnitude"],
+    }
+    client.post(f"/predict?target={WEB_TARGET}", data=form)  # loads the model outside the timed runs
+    results["predict"] = time_calls(lambda: client.post(f"/predict?target={WEB_TARGET}", data=form), repeats)
+    results["past_predictions"] = time_calls(lambda: client.get("/past_predictions"), repeats)
+
+    return results, client
+
+
+def bench_replay(client, csv_path, target, chunk_size):
+    # Replays the whole CSV through the batch API, as the catalogue-scoring jobs do
+    with open(csv_path, "rb") as f:
+        body = f.read()
+
+    start = perf_counter()
+    response = client.post(f"/api/predict/{target}?chunk_size={chunk_size}&format=csv", data=body, content_type="text/csv")
+    rows = max(0, response.get_data(as_text=True).count("\n") - 1)
+    seconds = perf_counter() - start
+
+    return {"status": response.status_code, "rows": rows, "seconds": seconds, "rows_per_second": rows / seconds if seconds else None}
+
+
+def flatten(results, prefix=""):
+    # Every timing ends up under one dotted key, e.g. "models.predict.radius.1000.p50_ms"
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and (name.endswith("_ms") or name.endswith("seconds")):
+            flat[name] = value
+    return flat
+
+
+def compare(results, baseline, threshold):
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+    for name, value in sorted(current.items()):
+        if name not in previous or not previous[name]:
+            continue
+        change = (value - previous[name]) / previous[name]
+        if change > threshold:
+            regressions.append({"metric": name, "baseline": previous[name], "current": value, "change": change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the star feature predictor hot paths.")
+    parser.add_argument("--data", default="data/star_data.csv", help="CSV used for predict inputs and the replay.")
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--repeats", type=int, default=50, help="Timed runs per single-row measurement.")
+    parser.add_argument("--history-rows", type=int, default=10_000, help="Synthetic predictions in the benchmark user's history.")
+    parser.add_argument("--replay-chunk-size", type=int, default=5000)
+    parser.add_argument("--skip", nargs="+", choices=["models", "web", "replay"], default=[], help="Benchmarks to leave out.")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="Previous results file to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown reported as a regression (0.2 = 20%%).")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data)
+    df.columns = df.columns.str.strip()
+    results = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        }
+    }
+
+    if "models" not in args.skip:
+        results["models"] = bench_models(df, args.model_dir, args.repeats)
+
+    if "web" not in args.skip or "replay" not in args.skip:
+        web, client = bench_web(df, args.history_rows, args.repeats)
+        if "web" not in args.skip:
+            results["web"] = web
+        if "replay" not in args.skip:
+            results["replay"] = bench_replay(client, args.data, WEB_TARGET, args.replay_chunk_size)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        results["regressions"] = regressions
+        for regression in regressions:
+            print(f"❌  {regression['metric']}: {regression['baseline']:.4f} -> {regression['current']:.4f} (+{regression['change']:.0%})")
+        if not regressions:
+            print(f"✅  No regressions beyond {args.threshold:.0%} against {args.baseline}")
+        exit_code = 1 if regressions else 0
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"[INFO] Results written to {args.output}")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+    Bounded cache of model outputs, placed in front of inference.
+
+    Keys are `(target, model version, canonical feature tuple)`, so a retrained model never serves
+    stale results. With `quantize_places` set, numeric inputs are rounded before they reach both the key
+    and the model, so near-identical submissions share one entry.
+
+"""
+
+import threading
+from time import monotonic
+from decimal import Decimal
+from collections import OrderedDict
+
+
+class PredictionCache:
+    def __init__(self, max_entries=10_000, ttl=None, quantize_places=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.quantize_places = quantize_places
+
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @property
+    def enabled(self):
+        return bool(self.max_entries)
+
+    def canonicalize(self, input_data):
+        if self.quantize_places is None:
+            return dict(input_data)
+
+        step = Decimal(1).scaleb(-self.quantize_places)
+        canonical = {}
+        for feature, value in input_data.items():
+            if isinstance(value, Decimal):
+                value = value.quantize(step)
+            elif isinstance(value, float):
+                value = round(value, self.quantize_places)
+            canonical[feature] = value
+        return canonical
+
+    def key(self, target, version, canonical_input):
+        return target, version, tuple(sorted(canonical_input.items()))
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+
+        target, version, _ = key
+        with self._lock:
+            self._check_version(target, version)
+            entry = self._entries.get(key)
+
+            if entry is not None and self.ttl is not None and monotonic() > entry[1]:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                entry = None
+
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+
+        target, version, _ = key
+        expires_at = monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._check_version(target, version)
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, target=None):
+        with self._lock:
+            self._invalidate(target)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+            }
+
+    def _check_version(self, target, version):
+        # A new model version for a target drops every entry computed by the previous one
+        if self._versions.get(target, version) != version:
+            self._invalidate(target)
+        self._versions[target] = version
+
+    def _invalidate(self, target):
+        stale = [key for key in self._entries if target is None or key[0] == target]
+        for key in stale:
+            del self._entries[key]
+        self._stats["invalidations"] += len(stale)
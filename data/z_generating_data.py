@@ -1,52 +1,189 @@
 """
-    This is how I randomly generated star data (with help of ChatGPT).
-    
+    Synthetic star data generator (the original 100k rows were generated randomly, with help of ChatGPT).
+
+    Rows are generated chunk by chunk, so memory stays bounded by `--chunk-size` whatever `--rows` is, and
+    chunks can be generated in parallel with `--workers`. Every chunk has its own seed derived from `--seed`,
+    so the output is the same for any number of workers.
+
+    The star type is drawn first, with every type equally likely as in the original dataset, and temperature and
+    radius are drawn log-uniformly from the ranges of that type, so every type, spectral class and color shows up
+    in any sample of a few hundred rows. Everything else follows from them: luminosity from the Stefan-Boltzmann
+    law, absolute magnitude from luminosity, spectral class and color from temperature. `--label-noise` reassigns
+    that fraction of the categorical labels at random.
+
+        python data/z_generating_data.py --rows 10000000 --workers 8 --output data/star_data_10m.parquet
+
 """
 
-import pandas as pd
+import os
+import argparse
 import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+
+COLUMNS = ["Radius", "Temperature", "Luminosity", "Absolute_Magnitude", "Star_Color", "Spectral_Class", "Star_Type"]
+SUN_TEMPERATURE = 5778
+SUN_ABSOLUTE_MAGNITUDE = 4.83
+
+# Lower temperature bound (K) of each spectral class and color, hottest first
+SPECTRAL_CLASSES = [(30000, "O"), (10000, "B"), (7500, "A"), (6000, "F"), (5200, "G"), (3700, "K"), (0, "M")]
+STAR_COLORS = [(30000, "Blue"), (10000, "Blue White"), (7500, "White"), (5200, "Yellow White"), (3700, "Orange"), (0, "Red")]
+STAR_TYPES = [0, 1, 2, 3, 4, 5]  # Brown Dwarf, Red Dwarf, White Dwarf, Main Sequence, Supergiant, Hypergiant
+# Per star type: temperature (K) and radius (solar radii) ranges. The hot ends reach the O class / Blue color band
+STAR_TYPE_RANGES = {
+    0: ((2000, 2700), (0.05, 0.15)),
+    1: ((2700, 4000), (0.15, 0.7)),
+    2: ((5000, 40000), (0.008, 0.05)),
+    3: ((3000, 40000), (0.7, 10)),
+    4: ((3000, 40000), (10, 100)),
+    5: ((3000, 40000), (100, 1500)),
+}
+
+
+def by_temperature(temperature, bands):
+    conditions = [temperature >= low for low, _ in bands]
+    return np.select(conditions, [label for _, label in bands], default=bands[-1][1])
+
+
+def log_uniform(rng, ranges, star_type):
+    # `ranges` holds the (low, high) bounds of each star type
+    bounds = np.log(np.array(ranges, dtype=np.float64))[star_type]
+    return np.exp(rng.uniform(bounds[:, 0], bounds[:, 1]))
+
+
+def add_label_noise(rng, labels, choices, fraction):
+    if not fraction:
+        return labels
+    noisy = rng.random(len(labels)) < fraction
+    labels[noisy] = rng.choice(choices, size=int(noisy.sum()))
+    return labels
+
+
+def generate_chunk(seed, rows, label_noise=0.0):
+    rng = np.random.default_rng(seed)
+
+    # Star properties, drawn per star type with the class balance of the original dataset
+    star_type = rng.choice(STAR_TYPES, size=rows)
+    temperature = log_uniform(rng, [STAR_TYPE_RANGES[t][0] for t in STAR_TYPES], star_type)
+    radius = log_uniform(rng, [STAR_TYPE_RANGES[t][1] for t in STAR_TYPES], star_type)
+
+    # Derived quantities: L = R^2 (T / T_sun)^4 in solar units, M = M_sun - 2.5 log10(L)
+    luminosity = radius ** 2 * (temperature / SUN_TEMPERATURE) ** 4
+    absolute_magnitude = SUN_ABSOLUTE_MAGNITUDE - 2.5 * np.log10(luminosity)
+
+    star_color = add_label_noise(rng, by_temperature(temperature, STAR_COLORS), [label for _, label in STAR_COLORS], label_noise)
+    spectral_class = add_label_noise(rng, by_temperature(temperature, SPECTRAL_CLASSES), [label for _, label in SPECTRAL_CLASSES], label_noise)
+    star_type = add_label_noise(rng, star_type, STAR_TYPES, label_noise)
+
+    return pd.DataFrame({
+        "Radius": radius,
+        "Temperature": temperature,
+        "Luminosity": luminosity,
+        "Absolute_Magnitude": absolute_magnitude,
+        "Star_Color": star_color,
+        "Spectral_Class": spectral_class,
+        "Star_Type": star_type,
+    }, columns=COLUMNS)
+
+
+def chunk_sizes(rows, chunk_size):
+    return [min(chunk_size, rows - start) for start in range(0, rows, chunk_size)]
+
+
+def generate_chunks(rows, chunk_size, seed, workers, label_noise):
+    # Yields chunks in order; at most 2 x workers chunks are held in memory at a time
+    sizes = chunk_sizes(rows, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if workers <= 1:
+        for child, size in zip(seeds, sizes):
+            yield generate_chunk(child, size, label_noise)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for child, size in zip(seeds, sizes):
+            pending.append(pool.submit(generate_chunk, child, size, label_noise))
+            if len(pending) >= 2 * workers:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+class ParquetOutput:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Writing parquet needs pyarrow: pip install pyarrow")
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.writer = None
+
+    def write(self, chunk):
+        # Categorical columns are stored dictionary-encoded; one row group per chunk
+        table = self.pa.Table.from_pandas(chunk.astype({"Star_Color": "category", "Spectral_Class": "category"}), preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class CsvOutput:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.header = True
 
-# Set random seed for reproducibility
-np.random.seed(42)
+    def write(self, chunk):
+        chunk.to_csv(self.file, header=self.header, index=False)
+        self.header = False
 
-# Define ranges and categories for synthetic star data
-num_rows = 100_000
+    def close(self):
+        self.file.close()
 
-# Star properties
-radius = np.random.lognormal(mean=0, sigma=1, size=num_rows) * 0.7
-temperature = np.random.normal(loc=5800, scale=4000, size=num_rows)
-temperature = np.clip(temperature, 2000, 40000)  # clamp to realistic star temperatures
 
-# Luminosity (log-normal based on temperature and radius)
-luminosity = radius**2 * (temperature / 5778)**4
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic star data in bounded memory.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="Rows generated and written at a time.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes generating chunks in parallel.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label-noise", type=float, default=0.0, help="Fraction of categorical labels reassigned at random.")
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "star_data_generated.csv"))
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Default: from the output file extension.")
+    parser.add_argument("--force", action="store_true", help="Overwrite the output file if it exists.")
+    args = parser.parse_args()
 
-# Absolute Magnitude - inverse log of luminosity
-absolute_magnitude = 4.83 - 2.5 * np.log10(luminosity)
+    for option, value in (("--rows", args.rows), ("--chunk-size", args.chunk_size)):
+        if value <= 0:
+            parser.error(f"{option} must be a positive number of rows")
 
-# Star colors
-colors = ['Red', 'Blue White', 'Yellow White', 'White', 'Orange', 'Blue']
-star_color = np.random.choice(colors, size=num_rows)
+    # The real training set lives next to the default output; never replace a dataset by accident
+    if os.path.exists(args.output) and not args.force:
+        parser.error(f"{args.output} already exists; pass --force to overwrite it")
 
-# Spectral classes (O, B, A, F, G, K, M)
-spectral_classes = ['O', 'B', 'A', 'F', 'G', 'K', 'M']
-spectral_class = np.random.choice(spectral_classes, size=num_rows, p=[0.01, 0.05, 0.1, 0.2, 0.3, 0.25, 0.09])
+    output_format = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    # Written next to the target and renamed at the end, so an interrupted run never leaves a truncated dataset
+    tmp_path = args.output + ".tmp"
+    output = ParquetOutput(tmp_path) if output_format == "parquet" else CsvOutput(tmp_path)
 
-# Star types (0 = Brown Dwarf, 1 = Red Dwarf, 2 = White Dwarf, 3 = Main Sequence, 4 = Supergiant, 5 = Hypergiant)
-star_type = np.random.choice([0, 1, 2, 3, 4, 5], size=num_rows)
+    written = 0
+    try:
+        for chunk in generate_chunks(args.rows, args.chunk_size, args.seed, args.workers, args.label_noise):
+            output.write(chunk)
+            written += len(chunk)
+            print(f"[INFO] {written:,} / {args.rows:,} rows written")
+    finally:
+        output.close()
+    os.replace(tmp_path, args.output)
 
-# Create DataFrame
-star_data = pd.DataFrame({
-    "Radius": radius,
-    "Temperature": temperature,
-    "Luminosity": luminosity,
-    "Absolute_Magnitude": absolute_magnitude,
-    "Star_Color": star_color,
-    "Spectral_Class": spectral_class,
-    "Star_Type": star_type
-})
+    print(f"[INFO] Saved {written:,} rows to {args.output}")
 
-# Saving to '.csv' file
-star_data.to_csv(r'..\data\star_data.csv', index=False)
 
-# Preview the data
-print(star_data)
+if __name__ == "__main__":
+    main()
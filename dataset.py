@@ -0,0 +1,149 @@
+"""
+    Columnar cache of the training data.
+
+    The CSV (or Parquet) is converted once, chunk by chunk, into one `.npy` file per column next to it
+    (`data/star_data.columns/`): float64 for the numeric columns, integer codes plus a category list for
+    Star_Color and Spectral_Class. Later runs memory-map those files instead of parsing text, and the cache is
+    rebuilt automatically when the source file changes. `iter_chunks` reads the cache a slice at a time, for
+    training on datasets larger than memory.
+
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from schema import CATEGORICAL_FEATURES, file_hash
+
+
+CACHE_VERSION = 1
+CACHE_SUFFIX = ".columns"
+CONVERT_CHUNK_SIZE = 1_000_000
+# Stored as category codes; Star_Type already is a small integer
+CODED_FEATURES = [feature for feature in CATEGORICAL_FEATURES if feature != "Star_Type"]
+
+
+def cache_dir(path):
+    return os.path.splitext(path)[0] + CACHE_SUFFIX
+
+
+def read_chunks(path, chunk_size=CONVERT_CHUNK_SIZE):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+        return
+
+    for chunk in pd.read_csv(path, chunksize=chunk_size, skipinitialspace=True):
+        chunk.columns = chunk.columns.str.strip()
+        yield chunk
+
+
+def source_stamp(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def read_meta(path):
+    try:
+        with open(os.path.join(cache_dir(path), "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != CACHE_VERSION or meta.get("source") != source_stamp(path):
+        return None
+    return meta
+
+
+def convert(path):
+    # Two passes over the source: one to count rows and collect categories, one to fill preallocated columns
+    rows, columns, categories = 0, None, {feature: {} for feature in CODED_FEATURES}
+    for chunk in read_chunks(path):
+        columns = columns or list(chunk.columns)
+        rows += len(chunk)
+        for feature, seen in categories.items():
+            for value in chunk[feature].astype(str).str.strip().unique():
+                seen.setdefault(value, len(seen))
+
+    directory = cache_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    arrays = {}
+    for column in columns:
+        dtype = np.int16 if column in CODED_FEATURES else np.int64 if column == "Star_Type" else np.float64
+        arrays[column] = np.lib.format.open_memmap(os.path.join(directory, f"{column}.npy.tmp"), mode="w+", dtype=dtype, shape=(rows,))
+
+    start = 0
+    for chunk in read_chunks(path):
+        end = start + len(chunk)
+        for column in columns:
+            if column in CODED_FEATURES:
+                arrays[column][start:end] = chunk[column].astype(str).str.strip().map(categories[column]).to_numpy()
+            else:
+                arrays[column][start:end] = chunk[column].to_numpy()
+        start = end
+
+    for array in arrays.values():
+        array.flush()
+    arrays.clear()  # closes the memory maps before the files are renamed
+    for column in columns:
+        os.replace(os.path.join(directory, f"{column}.npy.tmp"), os.path.join(directory, f"{column}.npy"))
+
+    meta = {
+        "version": CACHE_VERSION,
+        "source": source_stamp(path),
+        "source_hash": file_hash(path),
+        "rows": rows,
+        "columns": columns,
+        "categories": {feature: list(seen) for feature, seen in categories.items()},
+    }
+    # meta.json is written last, so a cache interrupted mid-conversion is never used
+    with open(os.path.join(directory, "meta.json.tmp"), "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(os.path.join(directory, "meta.json.tmp"), os.path.join(directory, "meta.json"))
+    return meta
+
+
+def source_hash(path):
+    # Hash of the source file, remembered in the cache so it is not recomputed on every run
+    meta = read_meta(path)
+    return meta["source_hash"] if meta else file_hash(path)
+
+
+def prepare(path):
+    # Builds the cache if it is missing or stale and returns its metadata
+    meta = read_meta(path)
+    if meta is None:
+        print(f"[INFO] Converting '{path}' to a columnar cache in '{cache_dir(path)}'")
+        meta = convert(path)
+    return meta
+
+
+def load_dataset(path):
+    meta = prepare(path)
+    directory = cache_dir(path)
+    data = {}
+    for column in meta["columns"]:
+        values = np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r")
+        if column in CODED_FEATURES:
+            values = pd.Categorical.from_codes(values, categories=meta["categories"][column])
+        data[column] = values
+
+    # copy=False keeps the numeric columns backed by the memory-mapped files
+    return pd.DataFrame(data, columns=meta["columns"], copy=False)
+
+
+def iter_chunks(path, chunk_size):
+    # Yields DataFrames of at most `chunk_size` rows, indexed by row number; only the current chunk is in memory
+    meta = prepare(path)
+    directory = cache_dir(path)
+    columns = {column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r") for column in meta["columns"]}
+
+    for start in range(0, meta["rows"], chunk_size):
+        end = min(start + chunk_size, meta["rows"])
+        data = {}
+        for column, values in columns.items():
+            values = np.array(values[start:end])
+            if column in CODED_FEATURES:
+                values = pd.Categorical.from_codes(values, categories=meta["categories"][column])
+            data[column] = values
+        yield pd.DataFrame(data, columns=meta["columns"], index=pd.RangeIndex(start, end))
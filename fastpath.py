@@ -0,0 +1,261 @@
+"""
+    Fast-path inference for the saved prediction pipelines.
+
+    `CompiledPipeline` turns a fitted `Pipeline(ColumnTransformer, RandomForest*)` into plain NumPy arrays:
+    one-hot index tables, stacked scaler / Yeo-Johnson parameters and the trees of the forest flattened
+    into one set of node arrays. Predicting then skips pandas and sklearn input validation entirely,
+    which dominates the cost of a single-row prediction, while reproducing the sklearn outputs exactly.
+    `uncertainty` reuses the same traversal to report how much the individual trees disagree.
+
+    Check parity on the training data with:  python fastpath.py data/star_data.csv
+
+"""
+
+import sys
+import numpy as np
+from scipy import stats
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler, PowerTransformer
+
+
+class CompiledPipeline:
+    def __init__(self, pipeline, features):
+        if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+            raise NotImplementedError("Expected Pipeline([preprocessor, model])")
+
+        preprocessor, forest = pipeline.steps[0][1], pipeline.steps[1][1]
+        if not isinstance(preprocessor, ColumnTransformer):
+            raise NotImplementedError("Expected a ColumnTransformer preprocessor")
+        if not isinstance(forest, (RandomForestClassifier, RandomForestRegressor)) or forest.n_outputs_ != 1:
+            raise NotImplementedError("Expected a single-output random forest")
+
+        self.features = list(features)
+        self.n_outputs = max(output.stop for output in preprocessor.output_indices_.values())
+        self.categorical = []
+        self.numeric = []
+        # Per input column: where its encoding lands in the transformed row and the parameters that produce it
+        self.layout = {}
+
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == "drop" or len(columns) == 0:
+                continue
+            steps = [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+            output = preprocessor.output_indices_[name]
+            if len(steps) == 1 and isinstance(steps[0], OneHotEncoder):
+                self._compile_one_hot(steps[0], columns, output)
+            else:
+                self._compile_numeric(steps, columns, output)
+
+        self._compile_forest(forest)
+
+    def _compile_one_hot(self, encoder, columns, output):
+        if encoder.handle_unknown != "ignore" or encoder.drop_idx_ is not None or getattr(encoder, "_infrequent_enabled", False):
+            raise NotImplementedError("Only OneHotEncoder(handle_unknown='ignore') without drop/infrequent categories")
+
+        offset = output.start
+        for column, categories in zip(columns, encoder.categories_):
+            # Unknown values map to no column at all, exactly like handle_unknown='ignore'
+            lookup = {category: offset + i for i, category in enumerate(categories.tolist())}
+            self.categorical.append((self.features.index(column), lookup))
+            self.layout[column] = ("one-hot", offset, tuple(categories.tolist()))
+            offset += len(categories)
+
+    def _compile_numeric(self, steps, columns, output):
+        transforms = []
+        for step in steps:
+            if isinstance(step, StandardScaler):
+                transforms.append(("scale", _scaler_params(step)))
+            elif isinstance(step, PowerTransformer) and step.method == "yeo-johnson":
+                # Use the same Yeo-Johnson implementation as the installed sklearn version
+                yeo_johnson = getattr(step, "_yeo_johnson_transform", None) or stats.yeojohnson
+                transforms.append(("yeo-johnson", (yeo_johnson, step.lambdas_.copy())))
+                if step.standardize:
+                    transforms.append(("scale", _scaler_params(step._scaler)))
+            else:
+                raise NotImplementedError(f"Unsupported numeric transformer: {type(step).__name__}")
+
+        self.numeric.append(([self.features.index(column) for column in columns], output, transforms))
+        for i, column in enumerate(columns):
+            steps = []
+            for kind, params in transforms:
+                if kind == "scale":
+                    steps.append((kind, tuple(None if p is None else float(p[i]) for p in params)))
+                else:
+                    steps.append((kind, (params[0], float(params[1][i]))))
+            self.layout[column] = ("numeric", output.start + i, tuple(steps))
+
+    def _compile_forest(self, forest):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+
+        self.is_classifier = isinstance(forest, RandomForestClassifier)
+        self.classes = forest.classes_ if self.is_classifier else None
+        self.n_trees = len(trees)
+        self.roots = offsets[:-1]
+
+        # Child indices are shifted into the flattened node space; leaves keep -1
+        self.left = np.concatenate([np.where(t.children_left >= 0, t.children_left + o, -1) for t, o in zip(trees, offsets)])
+        self.right = np.concatenate([np.where(t.children_right >= 0, t.children_right + o, -1) for t, o in zip(trees, offsets)])
+        self.feature = np.concatenate([np.maximum(t.feature, 0) for t in trees])
+        self.threshold = np.concatenate([t.threshold for t in trees])
+        self.value = np.concatenate([t.value[:, 0, :] for t in trees])
+        if not self.is_classifier:
+            self.value = self.value[:, 0]
+
+    def transform(self, rows):
+        # `rows` is a DataFrame or a list of dicts keyed by the training column names
+        if hasattr(rows, "to_numpy"):
+            values = rows[self.features].to_numpy(dtype=object)
+        else:
+            values = np.array([[row[feature] for feature in self.features] for row in rows], dtype=object)
+
+        X = np.zeros((len(values), self.n_outputs), dtype=np.float64)
+
+        for index, lookup in self.categorical:
+            for row, value in enumerate(values[:, index].tolist()):
+                position = lookup.get(value)
+                if position is not None:
+                    X[row, position] = 1.0
+
+        for indices, output, transforms in self.numeric:
+            block = values[:, indices].astype(np.float64)
+            for kind, params in transforms:
+                if kind == "scale":
+                    mean, scale = params
+                    if mean is not None:
+                        block -= mean
+                    if scale is not None:
+                        block /= scale
+                else:
+                    yeo_johnson, lambdas = params
+                    for i, lmbda in enumerate(lambdas):
+                        block[:, i] = yeo_johnson(block[:, i], lmbda)
+            X[:, output] = block
+
+        # Forests compare float32 features against float64 thresholds
+        return X.astype(np.float32)
+
+    def apply(self, X):
+        # Walks every tree for every row at once; returns leaf node ids with shape (n_trees, n_rows)
+        node = np.repeat(self.roots[:, None], len(X), axis=1)
+        rows = np.arange(len(X))[None, :]
+
+        while True:
+            left = self.left[node]
+            inner = left >= 0
+            if not inner.any():
+                return node
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(inner, np.where(go_left, left, self.right[node]), node)
+
+    def predict_proba(self, rows):
+        return self.predict_proba_transformed(self.transform(rows))
+
+    def predict_proba_transformed(self, X):
+        leaves = self.apply(X)
+        # A running sum adds tree by tree like the forest does (np.sum may switch to pairwise summation)
+        proba = np.cumsum(self.value[leaves], axis=0)[-1]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, rows):
+        return self.predict_transformed(self.transform(rows))
+
+    def predict_transformed(self, X):
+        # `X` is the float32 output of `transform`, or an equal matrix assembled from shared column encodings
+        if self.is_classifier:
+            return self.classes.take(np.argmax(self.predict_proba_transformed(X), axis=1), axis=0)
+        return self.predict_proba_transformed(X)
+
+    def predict_one(self, row):
+        return self.predict([row])[0]
+
+    def uncertainty(self, rows, level=0.9):
+        return self.uncertainty_transformed(self.transform(rows), level)
+
+    def uncertainty_transformed(self, X, level=0.9):
+        # One traversal of all trees gives every tree's output per row; returns one dict per row with the prediction
+        # and, for regressors, the spread of the tree predictions and their central `level` interval, or, for
+        # classifiers, the class probabilities, the probability of the predicted class and its spread over the trees
+        leaves = self.apply(X)
+        per_tree = self.value[leaves]
+        mean = np.cumsum(per_tree, axis=0)[-1] / self.n_trees
+        rows = np.arange(len(X))
+
+        if self.is_classifier:
+            best = np.argmax(mean, axis=1)
+            predictions = self.classes.take(best, axis=0)
+            spread = per_tree[:, rows, best].std(axis=0)
+            classes = [str(c) for c in self.classes.tolist()]
+            return [
+                {
+                    "prediction": prediction,
+                    "confidence": float(mean[row, best[row]]),
+                    "std": float(spread[row]),
+                    "probabilities": dict(zip(classes, mean[row].tolist())),
+                }
+                for row, prediction in enumerate(predictions.tolist())
+            ]
+
+        lower, upper = np.quantile(per_tree, [(1 - level) / 2, (1 + level) / 2], axis=0)
+        spread = per_tree.std(axis=0)
+        return [
+            {"prediction": float(mean[row]), "std": float(spread[row]), "lower": float(lower[row]), "upper": float(upper[row]), "level": level}
+            for row in rows.tolist()
+        ]
+
+
+def _scaler_params(scaler):
+    mean = scaler.mean_.copy() if scaler.with_mean else None
+    scale = scaler.scale_.copy() if scaler.with_std else None
+    return mean, scale
+
+
+def compile_pipeline(pipeline, features):
+    try:
+        return CompiledPipeline(pipeline, features)
+    except NotImplementedError as e:
+        print(f"[ERROR] Cannot compile pipeline for fast-path inference: {e}")
+        return None
+
+
+def verify_parity(csv_path, model_dir="models", batch_size=10_000):
+    import pandas as pd
+    from registry import ModelRegistry
+
+    df = pd.read_csv(csv_path)
+    df.columns = df.columns.str.strip()
+    registry = ModelRegistry(model_dir=model_dir, max_models=1)
+    all_identical = True
+
+    for key in registry.keys():
+        entry = registry.get(key)
+        if entry is None:
+            continue
+
+        model, features = entry["model"], entry["features"]
+        compiled = CompiledPipeline(model, features)
+        forest = model.steps[-1][1]
+        forest.n_jobs = 1  # threaded accumulation order is not deterministic
+
+        mismatches = 0
+        for start in range(0, len(df), batch_size):
+            X = df.iloc[start:start + batch_size][features]
+            expected = model.predict(X)
+            actual = compiled.predict(X)
+            mismatches += int(np.sum(expected != actual))
+            if compiled.is_classifier:
+                mismatches += int(np.sum(model.predict_proba(X) != compiled.predict_proba(X)))
+
+        single = compiled.predict_one(df.iloc[0][features].to_dict()) == model.predict(df.iloc[[0]][features])[0]
+        identical = mismatches == 0 and bool(single)
+        all_identical &= identical
+        print(f"{'✅' if identical else '❌'}  {key}: {mismatches} mismatching values over {len(df)} rows")
+
+    return all_identical
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_parity(sys.argv[1] if len(sys.argv) > 1 else "data/star_data.csv") else 1)
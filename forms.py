@@ -1,21 +1,32 @@
 from wtforms import StringField, SelectField, PasswordField, DecimalField, SubmitField
 from wtforms.validators import DataRequired, NumberRange, Email, Length, EqualTo
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from decimal import Decimal
-import pandas as pd
+from schema import load_schema, STAR_TYPES
 
 
-data = pd.read_csv(r'data\star_data.csv')
-STAR_TYPES = {
-    0: "Brown Dwarf",
-    1: "Red Dwarf",
-    2: "White Dwarf",
-    3: "Main Sequence",
-    4: "Supergiant",
-    5: "Hypergiant"
+SCHEMA = load_schema()
+STAR_COLORS = list(SCHEMA["categories"]["Star_Color"])
+SPECTRAL_CLASSES = list(SCHEMA["categories"]["Spectral_Class"])
+NUMERIC_RANGES = {
+    feature.lower(): (Decimal(low), Decimal(high)) for feature, (low, high) in SCHEMA["ranges"].items()
 }
 
 
+def apply_schema(schema):
+    # Updates the shared objects in place, so the forms (WTForms copies `choices` per form instance), the batch
+    # validation and the API pick up the categories of a newly served release without re-importing anything.
+    # The NumberRange bounds of the form fields are fixed at import; they come from INPUT_RANGES in schema.py
+    SCHEMA.clear()
+    SCHEMA.update(schema)
+    STAR_COLORS[:] = schema["categories"]["Star_Color"]
+    SPECTRAL_CLASSES[:] = schema["categories"]["Spectral_Class"]
+    NUMERIC_RANGES.update({
+        feature.lower(): (Decimal(low), Decimal(high)) for feature, (low, high) in schema["ranges"].items()
+    })
+
+
 class SignUp(FlaskForm):
     name = StringField(label="Name", validators=[DataRequired()])
     username = StringField(label="Unique User Name", validators=[DataRequired(), Length(2, 30)])
@@ -39,8 +50,8 @@ class Input(FlaskForm):
         validators=[
             DataRequired(),
             NumberRange(
-                min=Decimal('0.01').quantize(Decimal('1.0000000000000000')),
-                max=Decimal('1000').quantize(Decimal('1.0000000000000000')),
+                min=NUMERIC_RANGES['radius'][0].quantize(Decimal('1.0000000000000000')),
+                max=NUMERIC_RANGES['radius'][1].quantize(Decimal('1.0000000000000000')),
                 message='Value must be between (0, 1000]  with decimal precision upto 16 digits.'
             )
         ]
@@ -52,8 +63,8 @@ class Input(FlaskForm):
         validators=[
             DataRequired(),
             NumberRange(
-                min=Decimal('0').quantize(Decimal('1.0000000000000000')),
-                max=Decimal('1.0e+07').quantize(Decimal('1.0000000000000000')),
+                min=NUMERIC_RANGES['luminosity'][0].quantize(Decimal('1.0000000000000000')),
+                max=NUMERIC_RANGES['luminosity'][1].quantize(Decimal('1.0000000000000000')),
                 message='Value must be between [0, 1.0e+07] with decimal precision upto 16 digits.'
             )
         ]
@@ -65,8 +76,8 @@ class Input(FlaskForm):
         validators=[
             DataRequired(),
             NumberRange(
-                min=Decimal('300').quantize(Decimal('1.0000000000000000')),
-                max=Decimal('50000').quantize(Decimal('1.0000000000000000')),
+                min=NUMERIC_RANGES['temperature'][0].quantize(Decimal('1.0000000000000000')),
+                max=NUMERIC_RANGES['temperature'][1].quantize(Decimal('1.0000000000000000')),
                 message='Value must be between [300, 50000] with decimal precision upto 16 digits.'
             )
         ]
@@ -78,20 +89,20 @@ class Input(FlaskForm):
         validators=[
             DataRequired(),
             NumberRange(
-                min=Decimal('-12').quantize(Decimal('1.0000000000000000')),
-                max=Decimal('25').quantize(Decimal('1.0000000000000000')),
+                min=NUMERIC_RANGES['absolute_magnitude'][0].quantize(Decimal('1.0000000000000000')),
+                max=NUMERIC_RANGES['absolute_magnitude'][1].quantize(Decimal('1.0000000000000000')),
                 message='Value must be between [-12, 25] with decimal precision upto 16 digits.'
             )
         ]
     )
     star_color = SelectField(
         label='Star Color',
-        choices=data.Star_Color.unique().tolist(),
+        choices=STAR_COLORS,
         validators=[DataRequired()]
     )
     spectral_class = SelectField(
         label='Spectral Class',
-        choices=data.Spectral_Class.unique().tolist(),
+        choices=SPECTRAL_CLASSES,
         validators=[DataRequired()]
     )
     star_type = SelectField(
@@ -102,3 +113,18 @@ class Input(FlaskForm):
     submit = SubmitField(
         label='Predict'
     )
+
+
+class ScoreFile(FlaskForm):
+    target = SelectField(
+        label='Feature To Predict',
+        choices=[(column.lower(), column.replace("_", " ")) for column in SCHEMA["columns"]],
+        validators=[DataRequired()]
+    )
+    file = FileField(
+        label='CSV File Of Stars',
+        validators=[FileRequired(), FileAllowed(['csv'], 'Only CSV files can be scored.')]
+    )
+    submit = SubmitField(
+        label='Score File'
+    )
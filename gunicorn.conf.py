@@ -0,0 +1,37 @@
+"""
+    Gunicorn settings for serving the app with preforked workers: `gunicorn app:app`
+
+    The app (and any models listed in MODEL_WARMUP) is loaded once in the master process before forking.
+    The decoded tree arrays of each forest live in plain C buffers that workers only ever read, so the pages
+    stay shared copy-on-write between workers instead of every worker holding a private copy of every forest.
+    Use `MODEL_WARMUP=all` together with the uncompressed '*.mmap.joblib' artifacts
+    (`python model-training.py --artifact-format mmap`) for the fastest start-up and the smallest per-worker memory.
+
+"""
+
+import gc
+import os
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far into the permanent generation, so the garbage collector
+    # never writes to those objects in a worker and un-shares their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # The app does not start the model watcher at import, so the master runs none; each worker polls on its own
+    from app import app, MODELS
+    if app.config['MODEL_WATCH_INTERVAL']:
+        MODELS.watch(app.config['MODEL_WATCH_INTERVAL'])
+
+
+def worker_exit(server, worker):
+    # Write out predictions still waiting in the write-behind queue before the worker goes away
+    from app import PREDICTION_WRITER
+    PREDICTION_WRITER.close()
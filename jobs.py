@@ -0,0 +1,219 @@
+"""
+    Background scoring of uploaded CSV files.
+
+    An upload is saved under `SCORING_DIR/<job id>/` and scored chunk by chunk by a bounded thread pool with the
+    same validation and vectorized `predict` as the batch API. Progress is kept in a `status.json` next to the
+    upload, so any worker process can report it, and the results are written to `results.csv` for download.
+    A job whose process died before it finished (a restart, a killed worker) is marked failed when the app starts
+    and when its status is read.
+
+"""
+
+import os
+import json
+import uuid
+import socket
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from pytz import timezone
+from batch import BATCH_CHUNK_SIZE, read_csv_chunks, score_chunks, to_csv
+from models import db, Prediction
+
+
+IST = timezone('Asia/Kolkata')
+SCORING_DIR = "scoring_jobs"
+PENDING_STATUSES = ("queued", "running")
+
+
+def count_rows(path):
+    # Counts newlines in binary blocks; much cheaper than parsing, and only used for the progress bar
+    rows = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            rows += block.count(b"\n")
+    return max(0, rows - 1)
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to another user
+        return True
+    return True
+
+
+class ScoringJobs:
+    def __init__(self, app, models, writer, job_dir=SCORING_DIR, max_workers=2, chunk_size=BATCH_CHUNK_SIZE):
+        self.app = app
+        self.models = models
+        self.writer = writer
+        self.job_dir = job_dir
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, target, upload):
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.path(job_id), exist_ok=True)
+        upload_path = self.path(job_id, "upload.csv")
+        upload.save(upload_path)
+
+        self._write_status(job_id, {
+            "id": job_id,
+            "user_id": user_id,
+            "target": target,
+            "filename": os.path.basename(upload.filename or "upload.csv"),
+            "status": "queued",
+            "total_rows": count_rows(upload_path),
+            "rows_done": 0,
+            "errors": 0,
+            "error": None,
+            "created": datetime.now(IST).isoformat(),
+            "finished": None,
+            # The process that runs the job, so a job orphaned by its death can be told from one still running
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+        })
+        self._pool().submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id, user_id):
+        try:
+            with open(self.path(job_id, "status.json")) as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if status["user_id"] != user_id:
+            return None
+        if self._orphaned(status):
+            status = self._fail_interrupted(status)
+        return status
+
+    def fail_interrupted(self):
+        # Called at start-up: queued or running jobs whose process is gone will never finish
+        try:
+            job_ids = os.listdir(self.job_dir)
+        except OSError:
+            return 0
+
+        failed = 0
+        for job_id in job_ids:
+            try:
+                with open(self.path(job_id, "status.json")) as f:
+                    status = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if self._orphaned(status):
+                self._fail_interrupted(status)
+                failed += 1
+
+        if failed:
+            print(f"[INFO] Marked {failed} interrupted scoring job(s) as failed")
+        return failed
+
+    def path(self, job_id, filename=None):
+        # Job ids are generated here, but they also arrive in URLs, so anything but a hex id is refused
+        if not job_id.isalnum():
+            raise ValueError(f"Invalid job id '{job_id}'")
+        return os.path.join(self.job_dir, job_id, filename) if filename else os.path.join(self.job_dir, job_id)
+
+    def _pool(self):
+        # The pool is created lazily per process; threads started in a preloading Gunicorn master do not survive the fork
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scoring")
+                self._pid = os.getpid()
+            return self._executor
+
+    def _orphaned(self, status):
+        # Jobs of other hosts, or from before pids were recorded, cannot be checked and are left alone
+        if status.get("status") not in PENDING_STATUSES or "pid" not in status:
+            return False
+        if status.get("host") != socket.gethostname():
+            return False
+        return status["pid"] != os.getpid() and not process_alive(status["pid"])
+
+    def _fail_interrupted(self, status):
+        status.update(status="failed", error="Interrupted: the server stopped before the job finished.", finished=datetime.now(IST).isoformat())
+        self._write_status(status["id"], status)
+        # Written directly rather than through the write-behind queue, which may run in a preloading master
+        with self.app.app_context():
+            db.session.add(self._summary_row(status))
+            db.session.commit()
+        return status
+
+    def _run(self, job_id):
+        with open(self.path(job_id, "status.json")) as f:
+            status = json.load(f)
+
+        status["status"] = "running"
+        self._write_status(job_id, status)
+
+        try:
+            model_entry = self.models.get(status["target"])
+            if model_entry is None:
+                raise ValueError(f"Model for '{status['target']}' not found or failed to load.")
+            status["model_version"] = model_entry["version"]
+
+            def tracked(batches):
+                for results in batches:
+                    status["rows_done"] += len(results)
+                    status["errors"] += sum(1 for result in results if "error" in result)
+                    self._write_status(job_id, status)
+                    yield results
+
+            with open(self.path(job_id, "upload.csv"), "rb") as upload, open(self.path(job_id, "results.csv"), "w", newline="") as out:
+                chunks = read_csv_chunks(upload, self.chunk_size)
+                batches = score_chunks(model_entry["model"], model_entry["features"], status["target"], chunks)
+                for text in to_csv(tracked(batches)):
+                    out.write(text)
+
+            status["status"] = "finished"
+        except Exception as e:
+            print(f"[ERROR] Scoring job {job_id} failed: {e}")
+            status.update(status="failed", error=str(e))
+
+        status["finished"] = datetime.now(IST).isoformat()
+        self._write_status(job_id, status)
+        self._record_summary(status)
+
+        try:
+            os.remove(self.path(job_id, "upload.csv"))
+        except OSError:
+            pass
+
+    def _record_summary(self, status):
+        with self.app.app_context():
+            self.writer.add(self._summary_row(status))
+
+    def _summary_row(self, status):
+        # One history row per file, so uploads show up next to the form predictions; the counts go with the
+        # other details in input_data, and `prediction` only says whether the file was scored
+        summary = {
+            "File": status["filename"],
+            "Rows": status["rows_done"],
+            "Scored_Rows": status["rows_done"] - status["errors"],
+            "Invalid_Rows": status["errors"],
+            "Job": status["id"],
+        }
+        return Prediction(
+            prediction_time=datetime.now(IST),
+            user_id=status["user_id"],
+            input_data=json.dumps(summary),
+            predicted_feature=status["target"].replace("-", " ").title(),
+            prediction="File scored" if status["status"] == "finished" else "Failed",
+            model_version=status.get("model_version")
+        )
+
+    def _write_status(self, job_id, status):
+        tmp_path = self.path(job_id, "status.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(status, f)
+        os.replace(tmp_path, self.path(job_id, "status.json"))
@@ -0,0 +1,166 @@
+"""
+    Joint prediction of every missing feature of a star in one pass.
+
+    All target pipelines were fitted on the same training rows, so the one-hot tables and the scaler /
+    Yeo-Johnson parameters of a given input column are usually identical across them. Each distinct column
+    encoding is computed once per request and copied into the input matrix of every forest that uses it
+    (via the compiled pipelines of `fastpath.py`), and the forests of the missing features run concurrently.
+
+    With several unknowns the missing inputs start from the training-data defaults in the schema and are then
+    refined: `rounds` repeats the concurrent pass with the previous predictions filled in, and `chained`
+    predicts the unknowns one after another so each prediction feeds the next one.
+
+    Check it on the training data, including categorical unknowns, with:  python joint.py data/star_data.csv
+
+"""
+
+import sys
+import json
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JointPredictor:
+    def __init__(self, registry, columns, defaults, max_workers=4):
+        self.registry = registry
+        self.columns = list(columns)
+        self.defaults = dict(defaults)
+        self.max_workers = max_workers
+
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def predict(self, known, rounds=1, chained=False):
+        # `known` maps training column names to validated values; returns the predictions of every other column
+        # and the version of the model that made each of them
+        unknown = [column for column in self.columns if column not in known]
+        if not unknown:
+            return {}, {}
+
+        resolved = {column: self._model(column) for column in unknown}
+        models = {column: model for column, (model, _) in resolved.items()}
+        versions = {column: version for column, (_, version) in resolved.items()}
+        missing = [column for column, model in models.items() if model is None]
+        if missing:
+            raise LookupError(f"Model not found or failed to load for: {', '.join(missing)}")
+
+        values = {**self.defaults, **known}
+        # A single unknown depends on known inputs only, so more passes would not change it
+        rounds = 1 if len(unknown) == 1 else max(1, rounds)
+        encodings = {}
+
+        for _ in range(rounds):
+            if chained:
+                for column in unknown:
+                    values[column] = self._predict_one(models[column], values, encodings)
+                    self._forget(encodings, column)
+            else:
+                predictions = dict(zip(unknown, self._pool().map(
+                    lambda column: self._predict_one(models[column], values, encodings), unknown
+                )))
+                values.update(predictions)
+                for column in unknown:
+                    self._forget(encodings, column)
+
+        return {column: values[column] for column in unknown}, versions
+
+    def _model(self, column):
+        key = column.lower().replace("_", "-")
+        entry = self.registry.get(key)
+        if entry is None:
+            return None, None
+
+        # Compiled once per model version when the registry does not compile on load (FAST_INFERENCE off)
+        return self.registry.compiled(key, entry), entry["version"]
+
+    def _predict_one(self, model, values, encodings):
+        X = np.zeros((1, model.n_outputs), dtype=np.float64)
+        for column, (kind, position, params) in model.layout.items():
+            encoded = self._encode(column, kind, params, values[column], encodings)
+            if kind == "one-hot":
+                if encoded is not None:
+                    X[0, position + encoded] = 1.0
+            else:
+                X[0, position] = encoded
+        # Forests compare float32 features against float64 thresholds, as in CompiledPipeline.transform
+        # Classifier labels may be Python objects (e.g. str), so convert through tolist() rather than .item()
+        return model.predict_transformed(X.astype(np.float32)).tolist()[0]
+
+    def _encode(self, column, kind, params, value, encodings):
+        # Identical transforms of a column are shared between models; bound Yeo-Johnson methods differ per model,
+        # so they are compared by their lambda only
+        if kind == "one-hot":
+            signature = (column, kind, params)
+        else:
+            signature = (column, kind, tuple((step, p if step == "scale" else p[1]) for step, p in params))
+
+        if signature not in encodings:
+            if kind == "one-hot":
+                encodings[signature] = params.index(value) if value in params else None
+            else:
+                block = np.array([float(value)], dtype=np.float64)
+                for step, p in params:
+                    if step == "scale":
+                        mean, scale = p
+                        if mean is not None:
+                            block -= mean
+                        if scale is not None:
+                            block /= scale
+                    else:
+                        yeo_johnson, lmbda = p
+                        block = yeo_johnson(block, lmbda)
+                encodings[signature] = block[0]
+        return encodings[signature]
+
+    def _forget(self, encodings, column):
+        # A new value for `column` invalidates its cached encodings
+        for signature in [signature for signature in encodings if signature[0] == column]:
+            del encodings[signature]
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="joint")
+            return self._executor
+
+
+def verify_joint(csv_path, model_dir="models", rows=20):
+    import pandas as pd
+    from registry import ModelRegistry
+    from schema import load_schema
+
+    df = pd.read_csv(csv_path, nrows=rows)
+    df.columns = df.columns.str.strip()
+    schema = load_schema()
+    joint = JointPredictor(ModelRegistry(model_dir=model_dir), schema["columns"], schema["defaults"], max_workers=2)
+
+    # Every case leaves at least one categorical feature unknown, plus one with only numeric unknowns
+    cases = [
+        ["Temperature", "Radius"],
+        ["Star_Color"],
+        ["Spectral_Class", "Luminosity", "Absolute_Magnitude"],
+        ["Star_Color", "Spectral_Class", "Star_Type", "Temperature", "Radius", "Luminosity"],
+    ]
+    failures = 0
+    for known_columns in cases:
+        for chained in (False, True):
+            for _, row in df.iterrows():
+                known = {column: row[column].item() if hasattr(row[column], "item") else row[column] for column in known_columns}
+                try:
+                    predictions, _ = joint.predict(known, rounds=2, chained=chained)
+                    # The results are returned as JSON by /api/predict_missing
+                    json.dumps(predictions)
+                    if set(predictions) != set(joint.columns) - set(known_columns):
+                        raise AssertionError(f"predicted {sorted(predictions)}")
+                except Exception as e:
+                    failures += 1
+                    print(f"❌  known={known_columns} chained={chained}: {type(e).__name__}: {e}")
+                    break
+
+    print(f"{'✅' if not failures else '❌'}  {len(cases) * 2} joint prediction cases, {failures} failing")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if verify_joint(sys.argv[1] if len(sys.argv) > 1 else "data/star_data.csv") else 1)
@@ -0,0 +1,162 @@
+"""
+    Low-overhead latency histograms for the request hot paths, exposed in Prometheus text format on /metrics.
+
+    A stage is timed with `with METRICS.time("predict", "model_predict", target):` and lands in a fixed-bucket
+    histogram, so recording is one `bisect` and a few additions under a lock. Requests can also be sampled into
+    cProfile dumps with `Profiler`.
+
+"""
+
+import os
+import random
+import cProfile
+import threading
+from time import perf_counter, time
+from bisect import bisect_left
+from contextlib import contextmanager
+from collections import defaultdict
+
+
+# Seconds; from sub-millisecond cache hits up to slow cold model loads
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Only one profiler can be active per process (on Python 3.12+ a second `enable()` raises), so requests that
+# are sampled while another one is being profiled are skipped
+PROFILE_LOCK = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    def __init__(self):
+        self._histograms = defaultdict(Histogram)
+        self._counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def time(self, route, stage, target=None):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(route, stage, target, perf_counter() - start)
+
+    def observe(self, route, stage, target, seconds):
+        with self._lock:
+            self._histograms[(route, stage, target or "")].observe(seconds)
+
+    def increment(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def count_queries(self, engine):
+        # Every statement sent to the database, including those of the write-behind queue
+        from sqlalchemy import event
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def count_query(conn, cursor, statement, parameters, context, executemany):
+            self.increment("star_db_queries_total", operation=statement.lstrip().split(" ", 1)[0].upper())
+
+    def render(self, gauges=()):
+        # `gauges` are (name, labels, value) tuples sampled by the caller, e.g. model load times and cache stats
+        lines = [
+            "# HELP star_request_stage_seconds Time spent in each stage of a request.",
+            "# TYPE star_request_stage_seconds histogram",
+        ]
+        with self._lock:
+            histograms = {key: (list(h.counts), h.total, h.count, h.buckets) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        for (route, stage, target), (counts, total, count, buckets) in sorted(histograms.items()):
+            labels = f'route="{route}",stage="{stage}",target="{target}"'
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'star_request_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'star_request_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"star_request_stage_seconds_sum{{{labels}}} {total}")
+            lines.append(f"star_request_stage_seconds_count{{{labels}}} {count}")
+
+        typed = set()
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{format_labels(dict(labels))} {value}")
+
+        for name, labels, value in gauges:
+            if value is None:
+                continue
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(f"{name}{format_labels(labels)} {float(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class Profiler:
+    # Profiles a random `sample_rate` fraction of requests and writes one .prof file per sampled request;
+    # only the newest `keep` files are kept
+    def __init__(self, sample_rate=0.0, output_dir="profiles", keep=None):
+        self.sample_rate = sample_rate
+        self.output_dir = output_dir
+        self.keep = keep
+
+    def start(self):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return None
+        if not PROFILE_LOCK.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool is active, e.g. a debugger; profiling must never fail the request
+            PROFILE_LOCK.release()
+            return None
+        return profile
+
+    def stop(self, profile, name):
+        try:
+            profile.disable()
+        finally:
+            PROFILE_LOCK.release()
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{name}-{int(time() * 1000)}-{os.getpid()}.prof")
+        profile.dump_stats(path)
+        self._prune()
+        return path
+
+    def _prune(self):
+        if self.keep is None:
+            return
+        paths = [os.path.join(self.output_dir, name) for name in os.listdir(self.output_dir) if name.endswith(".prof")]
+        if len(paths) <= self.keep:
+            return
+        paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in paths[:len(paths) - self.keep]:
+            try:
+                os.remove(path)
+            except OSError:
+                # Another worker pruned it first
+                pass
+
+
+METRICS = Metrics()
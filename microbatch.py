@@ -0,0 +1,121 @@
+"""
+    Micro-batching of concurrent single-row predictions.
+
+    Rows submitted by request threads are collected for up to `window_ms` (or until `max_batch` rows) and scored
+    with one vectorized `predict` per model in a bounded inference pool. At most `max_queue` rows may be waiting or
+    being scored; beyond that `predict` raises `QueueFull` at once, so the server answers 503 instead of piling up requests.
+
+"""
+
+import os
+import queue
+import threading
+from time import monotonic
+from concurrent.futures import Future, ThreadPoolExecutor
+import pandas as pd
+from metrics import METRICS
+
+
+class QueueFull(Exception):
+    pass
+
+
+def predict_rows(entry, rows, level=None):
+    # One dict per row; with `level` and a compiled pipeline it also holds the uncertainty of the prediction
+    compiled = entry.get("compiled")
+    if compiled is not None and level:
+        return compiled.uncertainty(rows, level)
+    if compiled is not None:
+        predictions = compiled.predict(rows).tolist()
+    else:
+        predictions = entry["model"].predict(pd.DataFrame(rows)[entry["features"]]).tolist()
+    return [{"prediction": prediction} for prediction in predictions]
+
+
+class MicroBatcher:
+    def __init__(self, window_ms=0, max_batch=256, max_queue=1024, max_workers=2, timeout=30.0, level=None):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.level = level
+
+        self._queue = queue.Queue()
+        # Counts rows until their result is set, not just until the collector picks them up
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._in_flight = 0
+        self._executor = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.window > 0
+
+    def predict(self, target, entry, row):
+        self._ensure_started()
+        if not self._slots.acquire(blocking=False):
+            METRICS.increment("star_microbatch_rejected_total", target=target)
+            raise QueueFull(f"More than {self.max_queue} predictions are waiting")
+
+        with self._lock:
+            self._in_flight += 1
+        future = Future()
+        self._queue.put(((target, entry["version"]), entry, row, future))
+        return future.result(timeout=self.timeout)
+
+    def stats(self):
+        with self._lock:
+            return {"enabled": self.enabled, "in_flight": self._in_flight, "max_queue": self.max_queue}
+
+    def _ensure_started(self):
+        # Threads started in a preloading Gunicorn master do not survive the fork, so each process starts its own
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+            self._thread = threading.Thread(target=self._collect, name="micro-batcher", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Rows for different models (or versions of one model) are scored separately
+            groups = {}
+            for key, entry, row, future in batch:
+                groups.setdefault(key, (entry, []))[1].append((row, future))
+            for (target, _), (entry, items) in groups.items():
+                self._executor.submit(self._score, target, entry, items)
+
+    def _score(self, target, entry, items):
+        METRICS.increment("star_microbatch_batches_total", target=target)
+        METRICS.increment("star_microbatch_rows_total", value=len(items), target=target)
+        try:
+            with METRICS.time("microbatch", "model_predict", target):
+                outputs = predict_rows(entry, [row for row, _ in items], self.level)
+        except Exception as e:
+            for _, future in items:
+                future.set_exception(e)
+        else:
+            for (_, future), output in zip(items, outputs):
+                future.set_result(output)
+        finally:
+            with self._lock:
+                self._in_flight -= len(items)
+            for _ in items:
+                self._slots.release()
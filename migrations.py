@@ -0,0 +1,68 @@
+"""
+    Small, idempotent schema migrations for users.db, applied at start-up by `upgrade()`.
+
+    New columns of the models are added to existing tables with ALTER TABLE, then every data migration
+    in MIGRATIONS that is not yet recorded in the `schema_migration` table runs once.
+    New tables are created beforehand by `db.create_all()`.
+
+"""
+
+import json
+from sqlalchemy import inspect, text
+from models import db, Prediction, SchemaMigration, decode_input_data, create_indexes
+from summary import rebuild_summaries
+
+
+def add_missing_columns():
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                db.session.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+    db.session.commit()
+
+
+def backfill_prediction_features(batch_size=1000):
+    last_id = 0
+    while True:
+        rows = Prediction.query.filter(Prediction.id > last_id).order_by(Prediction.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        for row in rows:
+            try:
+                row.set_features(decode_input_data(row.input_data), row.prediction)
+            except json.JSONDecodeError as e:
+                print(f"[ERROR] Cannot backfill prediction {row.id}: {e}")
+
+        db.session.commit()
+        last_id = rows[-1].id
+
+
+MIGRATIONS = [
+    ("0001_backfill_prediction_features", backfill_prediction_features),
+    ("0002_build_prediction_summaries", rebuild_summaries),
+]
+
+
+def upgrade():
+    add_missing_columns()
+    create_indexes()
+
+    applied = {migration.name for migration in SchemaMigration.query.all()}
+    for name, migration in MIGRATIONS:
+        if name in applied:
+            continue
+        print(f"[INFO] Applying migration '{name}'")
+        migration()
+        db.session.add(SchemaMigration(name=name))
+        db.session.commit()
+
+
+if __name__ == "__main__":
+    from app import app
+
+    with app.app_context():
+        upgrade()
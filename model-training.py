@@ -1,17 +1,34 @@
 # Import libraries
+import os
+import json
+import hashlib
+import argparse
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
-from time import time
-from joblib import dump
+import sklearn
+from time import time, perf_counter
+from datetime import datetime
+from joblib import dump, load
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from sklearn.metrics import accuracy_score, r2_score
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.preprocessing import OneHotEncoder, StandardScaler, PowerTransformer
+from registry import MODEL_FILES, current_model_dir, current_release, publish_release, release_dir
+from schema import SCHEMA_FILENAME, SCHEMA_VERSION, build_schema_from_csv, save_schema
+from dataset import iter_chunks, load_dataset, prepare, source_hash
 
-# Load data
-df = pd.read_csv("data/star_data.csv")
-df.columns = df.columns.str.strip()
+DATA_PATH = "data/star_data.csv"
+MODEL_DIR = "models"
+# Records, per target, the hash its artifact was trained with; written after every finished target
+MANIFEST_NAME = "training-manifest.json"
+# Written by --compact: one row per candidate model of every swept target
+COMPACT_REPORT_NAME = "compact-report.csv"
+BATCH_LATENCY_ROWS = 1000
 
 # Define feature types
 feature_types = {
@@ -28,67 +45,585 @@ feature_types = {
 categorical_features = ["Star_Color", "Spectral_Class", "Star_Type"]
 numerical_features = ["Temperature", "Radius", "Luminosity", "Absolute_Magnitude"]
 
-models = {}
+# Hyperparameters of each model type; part of the training hash, so changing them retrains the affected targets
+model_params = {
+    "clf": {},
+    "reg": {"n_estimators": 50, "max_depth": 10, "random_state": 42},
+}
+TEST_SIZE = 0.3
+SPLIT_SEED = 42
+# Bumped whenever the structure of the saved preprocessor changes
+PREPROCESSOR_VERSION = 2
+# --streaming: rows read at a time, and the size of the sample the Yeo-Johnson lambdas are fitted on
+STREAM_CHUNK_SIZE = 1_000_000
+POWER_SAMPLE_ROWS = 200_000
 
-for feature, ftype in feature_types.items():
-    print(f"🚀  Training model to predict: {feature}")
-    start_time = time()
+# Set in each worker process by init_worker, so the dataset is loaded, split and preprocessed once and not per target
+DATASET = {}
 
-    # Define X and y
-    X = df.drop(columns=[feature])
-    y = df[feature]
 
-    # Update feature lists for this specific target
-    categorical_cols = [col for col in categorical_features if col != feature]
-    numerical_cols = [col for col in numerical_features if col != feature]
+def artifact_paths(feature, output_dir):
+    compressed_path = os.path.join(output_dir, f"{feature.lower().replace('_', '-')}-predictor.joblib")
+    return compressed_path, compressed_path.replace(".joblib", ".mmap.joblib")
+
+
+def training_hash(data_hash, feature, artifact_format, sweep=None, chunk_size=None):
+    config = {
+        "data": data_hash,
+        "feature": feature,
+        "type": feature_types[feature],
+        "params": model_params[feature_types[feature]],
+        "test_size": TEST_SIZE,
+        "split_seed": SPLIT_SEED,
+        "artifact_format": artifact_format,
+        "preprocessor": PREPROCESSOR_VERSION,
+        "sklearn": sklearn.__version__,
+    }
+    if sweep is not None:
+        config["sweep"] = sweep
+    if chunk_size is not None:
+        config["streaming_chunk_size"] = chunk_size
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def load_saved_schema(output_dir):
+    try:
+        with open(os.path.join(output_dir, SCHEMA_FILENAME)) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest, output_dir):
+    # Written to a temporary file and renamed, so a crash never leaves a half-written manifest
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def is_up_to_date(manifest, feature, expected_hash, artifact_format, output_dir):
+    compressed_path, mmap_path = artifact_paths(feature, output_dir)
+    path = mmap_path if artifact_format == "mmap" else compressed_path
+    return manifest.get(feature, {}).get("hash") == expected_hash and os.path.exists(path)
+
+
+def seed_release(output_dir):
+    # A new release starts from links to the files of the current one, so unchanged targets are not retrained
+    source_dir = current_model_dir(MODEL_DIR)
+    filenames = [MANIFEST_NAME, COMPACT_REPORT_NAME, SCHEMA_FILENAME]
+    for filename in MODEL_FILES.values():
+        filenames += [filename, filename.replace(".joblib", ".mmap.joblib")]
+
+    for filename in filenames:
+        source, target = os.path.join(source_dir, filename), os.path.join(output_dir, filename)
+        if not os.path.exists(source) or os.path.exists(target):
+            continue
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+
+
+def init_worker(train_df, test_df, column_transforms, layout=None):
+    DATASET["train"], DATASET["test"] = train_df, test_df
+    DATASET["transforms"] = column_transforms
+    DATASET["layout"] = layout
+
+
+def column_transformer(column):
+    if column in categorical_features:
+        # Pipeline to transform categorical columns
+        return Pipeline([
+            ('encoder', OneHotEncoder(handle_unknown='ignore'))
+        ])
 
     # Pipeline to transform numerical columns
-    numeric_pipeline = Pipeline([
+    return Pipeline([
         ('scaler', StandardScaler()),
         ('pow_tnfr', PowerTransformer(method='yeo-johnson', standardize=True))
     ])
 
-    # Pipeline to transform categorical columns
-    categoric_pipeline = Pipeline([
-        ('encoder', OneHotEncoder(handle_unknown='ignore'))
-    ])
 
-    # ColumnTransformer to encode categorical columns + scale/transform numerical columns
+def fit_column_transforms(train_df):
+    # Every transform works column by column, so each column is fitted once and shared by all seven targets
+    return {column: column_transformer(column).fit(train_df[[column]]) for column in categorical_features + numerical_features}
+
+
+def build_pipeline(feature, params):
+    ftype = feature_types[feature]
+
+    # Update feature lists for this specific target
+    categorical_cols = [col for col in categorical_features if col != feature]
+    numerical_cols = [col for col in numerical_features if col != feature]
+
+    # ColumnTransformer to encode categorical columns + scale/transform numerical columns, one transformer per column
     preprocessor = ColumnTransformer(
-        transformers=[
-            ("cat", categoric_pipeline, categorical_cols),
-            ("num", numeric_pipeline, numerical_cols)
-        ]
+        transformers=[(col, column_transformer(col), [col]) for col in categorical_cols + numerical_cols]
     )
 
     # Define model type
-    model = RandomForestClassifier() if ftype == "clf" else RandomForestRegressor(n_estimators=50, max_depth=10, n_jobs=-1, random_state=42)
+    model = RandomForestClassifier(**params) if ftype == "clf" else RandomForestRegressor(**params)
 
     # Create pipeline
-    master_pipeline = Pipeline([
+    return Pipeline([
         ("preprocessor", preprocessor),
         ("model", model)
     ])
 
-    # Train-test split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+
+def save_artifact(feature, artifact, artifact_format, output_dir):
+    # Only one format per target is kept so the loader never picks up a stale file
+    compressed_path, mmap_path = artifact_paths(feature, output_dir)
+    path, stale_path = (mmap_path, compressed_path) if artifact_format == "mmap" else (compressed_path, mmap_path)
+    tmp_path = path + ".tmp"
+    # Dumped next to the final file and renamed, so a crash mid-write never replaces a good model with a partial one
+    dump(artifact, tmp_path, compress=3 if artifact_format == "compressed" else 0)
+    os.replace(tmp_path, path)
+    if os.path.exists(stale_path):
+        os.remove(stale_path)
+
+
+def layout_sample(df):
+    # A few rows holding every category of every categorical column
+    sample = df.index[:100]
+    for col in categorical_features:
+        if col in df:
+            sample = sample.union(df[col].drop_duplicates().index)
+    return df.loc[sample]
+
+
+def attach_transforms(preprocessor, sample):
+    # The ColumnTransformer is fitted on a small sample holding every category, which sets up its output layout,
+    # and then gets the transforms fitted once on the full training data
+    preprocessor.fit(sample)
+    preprocessor.transformers_ = [
+        (name, DATASET["transforms"].get(name, transformer), columns) for name, transformer, columns in preprocessor.transformers_
+    ]
+    return preprocessor
+
+
+def fit_pipeline(pipeline, X_train, y_train):
+    # Only the forest is fitted per target
+    preprocessor, model = pipeline.steps[0][1], pipeline.steps[-1][1]
+    attach_transforms(preprocessor, layout_sample(X_train))
+    model.fit(preprocessor.transform(X_train), y_train)
+    return pipeline
+
+
+def evaluate(feature, pipeline, X_test, y_test):
+    y_pred = pipeline.predict(X_test)
+    if feature_types[feature] == "clf":
+        return "Accuracy Score", accuracy_score(y_test, y_pred) * 100
+    return "R2 Score", r2_score(y_test, y_pred) * 100
+
+
+def target_split(feature):
+    # Define X and y
+    X_train, y_train = DATASET["train"].drop(columns=[feature]), DATASET["train"][feature]
+    X_test, y_test = DATASET["test"].drop(columns=[feature]), DATASET["test"][feature]
+    return X_train, y_train, X_test, y_test
+
+
+def train_target(feature, artifact_format, n_jobs, output_dir):
+    start_time = time()
+    X_train, y_train, X_test, y_test = target_split(feature)
+
+    # n_jobs is this target's share of the core budget
+    master_pipeline = build_pipeline(feature, dict(model_params[feature_types[feature]], n_jobs=n_jobs))
 
     # Fit model
-    master_pipeline.fit(X_train, y_train)
+    fit_pipeline(master_pipeline, X_train, y_train)
 
     # Save model
-    models[feature] = master_pipeline
-    dump((master_pipeline, X_train.columns.tolist()), f"models/{feature.lower().replace('_', '-')}-predictor.joblib", compress=3)
+    save_artifact(feature, (master_pipeline, X_train.columns.tolist()), artifact_format, output_dir)
 
     # Evaluate
-    y_pred = master_pipeline.predict(X_test)
+    metric, score = evaluate(feature, master_pipeline, X_test, y_test)
+    return {"metric": metric, "score": score, "seconds": time() - start_time}
+
+
+def is_test_row(index):
+    # Fibonacci hashing of the row number: the split does not depend on the chunk size or on the other rows
+    return (index.to_numpy(dtype=np.uint64) * np.uint64(2654435761) % np.uint64(2 ** 32)) / 2 ** 32 < TEST_SIZE
+
+
+def stream_column_transforms(chunk_size):
+    # One pass over the training rows: scalers are fitted incrementally, categories are collected, and the
+    # Yeo-Johnson lambdas are fitted on a uniform sample of at most POWER_SAMPLE_ROWS scaled values
+    rows = prepare(DATA_PATH)["rows"]
+    sample_fraction = min(1.0, POWER_SAMPLE_ROWS / max(1, rows * (1 - TEST_SIZE)))
+    rng = np.random.default_rng(SPLIT_SEED)
+
+    scalers = {col: StandardScaler() for col in numerical_features}
+    categories = {col: set() for col in categorical_features}
+    samples, layouts = [], []
+    for chunk in iter_chunks(DATA_PATH, chunk_size):
+        train = chunk[~is_test_row(chunk.index)]
+        for col, scaler in scalers.items():
+            scaler.partial_fit(train[[col]])
+        for col, seen in categories.items():
+            seen.update(train[col].unique())
+        samples.append(train[numerical_features][rng.random(len(train)) < sample_fraction])
+        layouts.append(layout_sample(train))
+
+    transforms = {}
+    for col, seen in categories.items():
+        transforms[col] = Pipeline([
+            ('encoder', OneHotEncoder(handle_unknown='ignore'))
+        ]).fit(pd.DataFrame({col: sorted(seen)}))
+
+    sample = pd.concat(samples)
+    for col, scaler in scalers.items():
+        power = PowerTransformer(method='yeo-johnson', standardize=True).fit(scaler.transform(sample[[col]]))
+        transforms[col] = Pipeline([('scaler', scaler), ('pow_tnfr', power)])
+
+    return transforms, layout_sample(pd.concat(layouts)), {col: sorted(seen) for col, seen in categories.items()}
+
+
+def train_target_streaming(feature, artifact_format, n_jobs, output_dir, chunk_size, classes):
+    # Grows the forest chunk by chunk with warm_start: every chunk adds its share of the trees, fitted on that
+    # chunk only, so memory is bounded by the chunk size and the finished forest has the usual structure
+    start_time = time()
+    ftype = feature_types[feature]
+    pipeline = build_pipeline(feature, dict(model_params[ftype], n_jobs=n_jobs, warm_start=True))
+    preprocessor, model = pipeline.steps[0][1], pipeline.steps[-1][1]
+    attach_transforms(preprocessor, DATASET["layout"].drop(columns=[feature]))
+
+    total_trees = model.get_params()["n_estimators"]
+    rows = prepare(DATA_PATH)["rows"]
+    chunks = -(-rows // chunk_size)
+    grown, skipped = 0, 0
+    for i, chunk in enumerate(iter_chunks(DATA_PATH, chunk_size)):
+        train = chunk[~is_test_row(chunk.index)]
+        # Trees are spread evenly over the chunks; with more chunks than trees some chunks add none
+        target_trees = total_trees * (i + 1) // chunks
+        if target_trees == grown or train.empty:
+            continue
+        y = train[feature]
+        # A warm-started classifier must see the same classes in every fit, so a chunk missing one is skipped
+        # and its trees are grown on the next chunk
+        if ftype == "clf" and y.nunique() != len(classes[feature]):
+            skipped += len(train)
+            continue
+        model.set_params(n_estimators=target_trees)
+        model.fit(preprocessor.transform(train.drop(columns=[feature])), y)
+        grown = target_trees
+
+    if grown == 0:
+        raise ValueError("no chunk held every class of the target; use a larger --chunk-size")
+    if grown < total_trees or skipped:
+        print(f"[WARNING] {feature}: grew {grown}/{total_trees} trees, skipped {skipped:,} rows of chunks missing a class")
+    model.set_params(warm_start=False)
+    features = [col for col in DATASET["layout"].columns if col != feature]
+    save_artifact(feature, (pipeline, features), artifact_format, output_dir)
+
+    # Streaming evaluation over the test rows
+    count, correct, y_sum, y_squares, errors = 0, 0, 0.0, 0.0, 0.0
+    for chunk in iter_chunks(DATA_PATH, chunk_size):
+        test = chunk[is_test_row(chunk.index)]
+        if test.empty:
+            continue
+        y_true, y_pred = test[feature].to_numpy(), pipeline.predict(test[features])
+        count += len(test)
+        if ftype == "clf":
+            correct += int((y_pred == y_true).sum())
+        else:
+            y_sum += float(y_true.sum())
+            y_squares += float(np.square(y_true).sum())
+            errors += float(np.square(y_true - y_pred).sum())
+
     if ftype == "clf":
-        acc = accuracy_score(y_test, y_pred) * 100
-        print(f"✅  Accuracy Score: {acc:.4f}%")
+        metric, score = "Accuracy Score", correct / max(1, count) * 100
     else:
-        r2 = r2_score(y_test, y_pred) * 100
-        print(f"✅  R2 Score: {r2:.4f}%")
+        total = y_squares - y_sum ** 2 / max(1, count)
+        metric, score = "R2 Score", (1 - errors / total) * 100 if total else 0.0
+    return {"metric": metric, "score": score, "seconds": time() - start_time, "trees": grown}
+
+
+def measure_latency(pipeline, X, repeats):
+    timings = []
+    for i in range(repeats):
+        start = perf_counter()
+        pipeline.predict(X[i % len(X)] if isinstance(X, list) else X)
+        timings.append((perf_counter() - start) * 1000)
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def measure_candidate(feature, pipeline, X_test, y_test, artifact_format, latency_repeats, path):
+    metric, score = evaluate(feature, pipeline, X_test, y_test)
+    artifact = (pipeline, X_test.columns.tolist())
+
+    # Size and load time are measured on a real artifact in the chosen format, which is kept at `path`
+    dump(artifact, path, compress=3 if artifact_format == "compressed" else 0)
+    artifact_bytes = os.path.getsize(path)
+    start = perf_counter()
+    load(path, mmap_mode="r" if artifact_format == "mmap" else None)
+    load_seconds = perf_counter() - start
+
+    rows = [X_test.iloc[[i]] for i in range(min(latency_repeats, len(X_test)))]
+    batch = X_test.iloc[:BATCH_LATENCY_ROWS]
+    single_p50, single_p99 = measure_latency(pipeline, rows, latency_repeats)
+    batch_p50, batch_p99 = measure_latency(pipeline, batch, max(5, latency_repeats // 20))
+
+    return {
+        "metric": metric,
+        "score": score,
+        "artifact_bytes": artifact_bytes,
+        "load_seconds": load_seconds,
+        "single_p50_ms": single_p50,
+        "single_p99_ms": single_p99,
+        "batch_p50_ms": batch_p50,
+        "batch_p99_ms": batch_p99,
+    }
+
+
+def pareto_front(candidates):
+    # A candidate is dominated if another one is at least as accurate, as small and as fast, and strictly better in one
+    keys = [("score", -1), ("artifact_bytes", 1), ("single_p99_ms", 1)]
+
+    def dominates(a, b):
+        not_worse = all(sign * a[key] <= sign * b[key] for key, sign in keys)
+        better = any(sign * a[key] < sign * b[key] for key, sign in keys)
+        return not_worse and better
+
+    return [c for c in candidates if not any(dominates(other, c) for other in candidates)]
+
+
+def compact_target(feature, artifact_format, n_jobs, sweep, output_dir):
+    start_time = time()
+    X_train, y_train, X_test, y_test = target_split(feature)
+    ftype = feature_types[feature]
+
+    # Only one fitted forest is in memory at a time: each candidate is measured on its artifact in a scratch
+    # directory, and the chosen one is loaded back from there
+    with tempfile.TemporaryDirectory() as sweep_dir:
+        candidates, paths = [], []
+        for n_estimators in sweep["n_estimators"]:
+            for max_depth in sweep["max_depth"]:
+                params = dict(model_params[ftype], n_estimators=n_estimators, max_depth=max_depth, random_state=SPLIT_SEED, n_jobs=n_jobs)
+                pipeline = fit_pipeline(build_pipeline(feature, params), X_train, y_train)
+                path = os.path.join(sweep_dir, f"candidate-{len(candidates)}.joblib")
+                result = measure_candidate(feature, pipeline, X_test, y_test, artifact_format, sweep["latency_repeats"], path)
+                del pipeline
+                result.update(target=feature, n_estimators=n_estimators, max_depth=max_depth)
+                result["within_budget"] = (
+                    (sweep["max_bytes"] is None or result["artifact_bytes"] <= sweep["max_bytes"])
+                    and (sweep["max_latency_ms"] is None or result["single_p99_ms"] <= sweep["max_latency_ms"])
+                )
+                candidates.append(result)
+                paths.append(path)
+
+        feasible = [c for c in candidates if c["within_budget"]]
+        if not feasible:
+            raise ValueError("no candidate fits the size/latency budget")
+
+        # Pareto-best: the smallest, then fastest, candidate on the front within `tolerance` points of the best score
+        front = pareto_front(feasible)
+        best_score = max(c["score"] for c in front)
+        chosen = min(
+            (c for c in front if c["score"] >= best_score - sweep["tolerance"]),
+            key=lambda c: (c["artifact_bytes"], c["single_p99_ms"])
+        )
+        for c in candidates:
+            c["pareto"] = any(c is f for f in front)
+            c["selected"] = c is chosen
+
+        save_artifact(feature, load(paths[candidates.index(chosen)]), artifact_format, output_dir)
+
+    return {
+        "metric": chosen["metric"],
+        "score": chosen["score"],
+        "seconds": time() - start_time,
+        "n_estimators": chosen["n_estimators"],
+        "max_depth": chosen["max_depth"],
+        "report": candidates,
+    }
+
+
+def main():
+    # Command line options
+    parser = argparse.ArgumentParser(description="Train the star feature predictor models.")
+    parser.add_argument(
+        "--artifact-format", choices=["compressed", "mmap"], default="compressed",
+        help="'compressed' writes small joblib files (compress=3); 'mmap' writes uncompressed "
+             "'*.mmap.joblib' files that load without decompression and with mmap_mode='r'."
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count() or 1,
+        help="Total number of cores to use. Targets are trained concurrently and share this budget (default: all cores)."
+    )
+    parser.add_argument(
+        "--targets", nargs="+", choices=list(feature_types), default=list(feature_types),
+        help="Only train these targets (default: all)."
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Retrain every selected target, even if its data and hyperparameters are unchanged."
+    )
+    compact = parser.add_argument_group("compactness mode")
+    compact.add_argument(
+        "--compact", action="store_true",
+        help="Sweep forest sizes per target and save the Pareto-best model within the budget, with a report in "
+             f"'{COMPACT_REPORT_NAME}' in the model directory. Latencies are most reliable with --jobs 1."
+    )
+    compact.add_argument("--n-estimators", type=int, nargs="+", default=[10, 25, 50, 100], help="Values of n_estimators to sweep.")
+    compact.add_argument(
+        "--max-depth", type=lambda value: None if value.lower() == "none" else int(value), nargs="+", default=[8, 12, 16, None],
+        help="Values of max_depth to sweep ('none' for unbounded trees)."
+    )
+    compact.add_argument("--max-bytes", type=int, default=None, help="Largest allowed artifact size in bytes.")
+    compact.add_argument("--max-latency-ms", type=float, default=None, help="Largest allowed p99 single-row predict latency.")
+    compact.add_argument(
+        "--tolerance", type=float, default=0.5,
+        help="Accuracy/R2 points the saved model may lose against the best candidate in exchange for a smaller model."
+    )
+    compact.add_argument("--latency-repeats", type=int, default=200, help="Single-row predictions timed per candidate.")
+    streaming = parser.add_argument_group("streaming mode")
+    streaming.add_argument(
+        "--streaming", action="store_true",
+        help="Train out of core for datasets larger than memory: the data is read --chunk-size rows at a time and "
+             "every chunk adds its share of the trees to a warm-started forest."
+    )
+    streaming.add_argument("--chunk-size", type=int, default=STREAM_CHUNK_SIZE, help="Rows held in memory at a time in streaming mode.")
+    parser.add_argument(
+        "--release", nargs="?", const="", default=None, metavar="NAME",
+        help="Train into a new versioned directory 'models/versions/NAME' (default name: a timestamp) and make it the "
+             "current release once every target succeeded. Running servers pick it up without a restart."
+    )
+    args = parser.parse_args()
+    if args.streaming and args.compact:
+        parser.error("--streaming and --compact cannot be combined")
+    chunk_size = max(1, args.chunk_size) if args.streaming else None
+
+    sweep = None
+    if args.compact:
+        sweep = {
+            "n_estimators": args.n_estimators,
+            "max_depth": args.max_depth,
+            "max_bytes": args.max_bytes,
+            "max_latency_ms": args.max_latency_ms,
+            "tolerance": args.tolerance,
+            "latency_repeats": args.latency_repeats,
+        }
+
+    output_dir = MODEL_DIR
+    if args.release is None and current_release(MODEL_DIR):
+        # The flat models/ directory is no longer served once a release is current, so train a new release instead
+        print(f"📁  '{current_release(MODEL_DIR)}' is the current release; training a new release instead of into {MODEL_DIR}/")
+        args.release = ""
+    if args.release is not None:
+        release = args.release or datetime.now().strftime("%Y%m%d-%H%M%S")
+        output_dir = release_dir(MODEL_DIR, release)
+        os.makedirs(output_dir, exist_ok=True)
+        seed_release(output_dir)
+        print(f"📁  Training release '{release}' in {output_dir}")
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    data_hash = source_hash(DATA_PATH)
+    manifest = load_manifest(output_dir)
+
+    # The web app reads category lists, input ranges and feature order from here instead of the CSV
+    # It is saved next to the models, so a release always ships the schema its models were trained with
+    schema = load_saved_schema(output_dir)
+    if schema.get("data_hash") != data_hash or schema.get("version") != SCHEMA_VERSION:
+        schema_path = os.path.join(output_dir, SCHEMA_FILENAME)
+        save_schema(build_schema_from_csv(DATA_PATH, data_hash), schema_path)
+        print(f"📝  Schema written to {schema_path}")
+
+    # Skip targets already trained with the same data and hyperparameters, e.g. before a crash
+    pending = {}
+    for feature in args.targets:
+        expected_hash = training_hash(data_hash, feature, args.artifact_format, sweep, chunk_size)
+        if not args.force and is_up_to_date(manifest, feature, expected_hash, args.artifact_format, output_dir):
+            print(f"⏭️  {feature} is up to date, skipping")
+        else:
+            pending[feature] = expected_hash
+
+    if not pending:
+        if args.release is not None:
+            publish_release(MODEL_DIR, release)
+            print(f"📌  Release '{release}' is now current")
+        print("🎉 All MODELS are up to date!")
+        return
+
+    if args.streaming:
+        # Only the column transforms and a few layout rows are kept; every target streams the data itself
+        column_transforms, layout, classes = stream_column_transforms(chunk_size)
+        initargs = (None, None, column_transforms, layout)
+    else:
+        # Load data (memory-mapped from the columnar cache) and split it once; every target trains and evaluates on the same rows
+        df = load_dataset(DATA_PATH)
+        train_df, test_df = train_test_split(df, test_size=TEST_SIZE, random_state=SPLIT_SEED)
+        initargs = (train_df, test_df, fit_column_transforms(train_df))
+
+    jobs = max(1, args.jobs)
+    workers = min(jobs, len(pending))
+    n_jobs = max(1, jobs // workers)
+    print(f"🚀  Training {len(pending)} models with {workers} processes x {n_jobs} cores")
+
+    start_time = time()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=initargs) as pool:
+        if args.streaming:
+            futures = {
+                pool.submit(train_target_streaming, feature, args.artifact_format, n_jobs, output_dir, chunk_size, classes): feature
+                for feature in pending
+            }
+        elif sweep is None:
+            futures = {pool.submit(train_target, feature, args.artifact_format, n_jobs, output_dir): feature for feature in pending}
+        else:
+            futures = {pool.submit(compact_target, feature, args.artifact_format, n_jobs, sweep, output_dir): feature for feature in pending}
+        failed, reports = [], []
+
+        for future in as_completed(futures):
+            feature = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌  Training {feature} failed: {e}")
+                failed.append(feature)
+                continue
+
+            if "report" in result:
+                report = pd.DataFrame(result.pop("report"))
+                reports.append(report)
+                print(f"📊  {feature} candidates:\n{report.drop(columns=['target', 'metric']).round(4).to_string(index=False)}")
+                print(f"📦  {feature}: saved n_estimators={result['n_estimators']}, max_depth={result['max_depth']}")
+
+            print(f"✅  {feature}: {result['metric']} {result['score']:.4f}% in {result['seconds']:.2f} seconds")
+            manifest[feature] = {"hash": pending[feature], "format": args.artifact_format, **result}
+            save_manifest(manifest, output_dir)
 
     print(f"⏱️  Training completed in {time() - start_time:.2f} seconds\n")
 
-print("🎉 All MODELS trained and saved!")
+    if reports:
+        # Rows of targets skipped in this run are kept from the previous report
+        report_path = os.path.join(output_dir, COMPACT_REPORT_NAME)
+        report = pd.concat(reports)
+        if os.path.exists(report_path):
+            previous = pd.read_csv(report_path)
+            report = pd.concat([previous[~previous["target"].isin(report["target"])], report])
+        report.to_csv(report_path + ".tmp", index=False)
+        os.replace(report_path + ".tmp", report_path)
+        print(f"📊  Compactness report written to {report_path}")
+
+    if failed:
+        raise SystemExit(f"Training failed for: {', '.join(failed)}. Re-run to resume; finished models are kept.")
+
+    if args.release is not None:
+        publish_release(MODEL_DIR, release)
+        print(f"📌  Release '{release}' is now current")
+
+    print("🎉 All MODELS trained and saved!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,29 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from datetime import datetime
+import json
 from pytz import timezone
 
 
 ist = timezone('Asia/Kolkata')
 db = SQLAlchemy()
+STAR_TYPE_CODES = {
+    "Brown Dwarf": 0,
+    "Red Dwarf": 1,
+    "White Dwarf": 2,
+    "Main Sequence": 3,
+    "Supergiant": 4,
+    "Hypergiant": 5
+}
+FEATURE_COLUMNS = {
+    "Star_Color": "star_color",
+    "Spectral_Class": "spectral_class",
+    "Star_Type": "star_type",
+    "Temperature": "temperature",
+    "Radius": "radius",
+    "Luminosity": "luminosity",
+    "Absolute_Magnitude": "absolute_magnitude",
+}
 
 
 class User(db.Model):
@@ -16,9 +35,133 @@ class User(db.Model):
 
 
 class Prediction(db.Model):
+    # Keyset pagination of a user's history walks this index newest first
+    __table_args__ = (
+        db.Index('ix_prediction_user_time', 'user_id', 'prediction_time', 'id'),
+        db.Index('ix_prediction_user_feature', 'user_id', 'predicted_feature', 'prediction_time'),
+        db.Index('ix_prediction_user_star_color', 'user_id', 'star_color'),
+        db.Index('ix_prediction_user_spectral_class', 'user_id', 'spectral_class'),
+        db.Index('ix_prediction_user_star_type', 'user_id', 'star_type'),
+        db.Index('ix_prediction_user_confidence', 'user_id', 'confidence'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     prediction_time = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(ist))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     input_data = db.Column(db.Text, nullable=False)
     predicted_feature = db.Column(db.String(20), nullable=False)
     prediction = db.Column(db.String(20), nullable=False)
+    # Release and artifact version of the model that made the prediction (see ModelRegistry.version)
+    model_version = db.Column(db.String(64))
+
+    # Typed copy of the star (inputs plus the predicted value) so history can be filtered and aggregated in SQL
+    star_color = db.Column(db.String(20))
+    spectral_class = db.Column(db.String(5))
+    star_type = db.Column(db.Integer)
+    temperature = db.Column(db.Float)
+    radius = db.Column(db.Float)
+    luminosity = db.Column(db.Float)
+    absolute_magnitude = db.Column(db.Float)
+
+    # How much the trees of the forest disagreed (see CompiledPipeline.uncertainty); empty when not computed
+    confidence = db.Column(db.Float)
+    prediction_std = db.Column(db.Float)
+    interval_low = db.Column(db.Float)
+    interval_high = db.Column(db.Float)
+    class_probabilities = db.Column(db.Text)
+
+    def set_features(self, input_data, prediction):
+        for column, value in structured_values(input_data, self.predicted_feature, prediction).items():
+            setattr(self, column, value)
+
+    def set_uncertainty(self, uncertainty):
+        self.confidence = uncertainty.get("confidence")
+        self.prediction_std = uncertainty.get("std")
+        self.interval_low = uncertainty.get("lower")
+        self.interval_high = uncertainty.get("upper")
+        if uncertainty.get("probabilities") is not None:
+            self.class_probabilities = json.dumps(uncertainty["probabilities"])
+
+
+class PredictionSummary(db.Model):
+    # Per user and predicted feature, kept up to date on every insert and delete of a Prediction (see summary.py)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    predicted_feature = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    # Distribution of the predicted value of numeric features
+    value_count = db.Column(db.Integer, nullable=False, default=0)
+    value_sum = db.Column(db.Float)
+    value_sum_squares = db.Column(db.Float)
+    value_min = db.Column(db.Float)
+    value_max = db.Column(db.Float)
+
+
+class PredictionValueCount(db.Model):
+    # Distribution of the predicted value of categorical features
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    predicted_feature = db.Column(db.String(20), primary_key=True)
+    value = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SchemaMigration(db.Model):
+    name = db.Column(db.String(100), primary_key=True)
+    applied_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(ist))
+
+
+def decode_input_data(input_data):
+    try:
+        return json.loads(input_data)
+    except json.JSONDecodeError:
+        # Some early rows were stored with Python's repr instead of JSON
+        return json.loads(input_data.replace("'", '"'))
+
+
+def structured_values(input_data, predicted_feature, prediction):
+    values = dict(input_data)
+    values[predicted_feature.replace(" ", "_")] = prediction
+    structured = {}
+
+    for feature, column in FEATURE_COLUMNS.items():
+        value = values.get(feature)
+        if value is None:
+            continue
+        try:
+            if column == "star_type":
+                value = STAR_TYPE_CODES[value] if value in STAR_TYPE_CODES else int(value)
+            elif column not in ("star_color", "spectral_class"):
+                value = float(value)
+        except (TypeError, ValueError):
+            continue
+        structured[column] = value
+
+    return structured
+
+
+def create_indexes():
+    # db.create_all() skips indexes of tables that already exist, e.g. in an older users.db
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def configure_sqlite(engine, journal_mode=None, synchronous=None, busy_timeout=None):
+    # PRAGMAs are per connection, so they are set on every new connection of the pool
+    if engine.dialect.name != "sqlite":
+        return
+
+    pragmas = [
+        ("journal_mode", journal_mode),
+        ("synchronous", synchronous),
+        ("busy_timeout", busy_timeout),
+    ]
+    pragmas = [(name, value) for name, value in pragmas if value is not None]
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
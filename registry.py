@@ -0,0 +1,372 @@
+"""
+    Lazy, on-demand registry of the trained prediction pipelines.
+
+    A target's pipeline is loaded from `models/` the first time it is requested and kept in an LRU cache
+    bounded by a model count and/or a memory budget, so each worker only holds the forests it actually serves.
+
+    Releases trained with `model-training.py --release` live in `models/versions/<name>/`, and `models/CURRENT`
+    names the one to serve. When the pointer or an artifact changes, loaded models are swapped in the background:
+    requests keep the entry they already hold and are served by the previous version until the new one is loaded.
+    Requests look at the files at most every `check_interval` seconds; the watcher and `reload()` always do.
+    Callbacks registered with `on_release` run when a new release is first served, e.g. to reload its schema.
+
+"""
+
+import os
+import sys
+import time
+import threading
+from time import perf_counter
+from collections import OrderedDict
+import numpy as np
+import joblib
+from fastpath import compile_pipeline
+
+
+MODEL_DIR = "models"
+MODEL_FILES = {
+    "absolute-magnitude": "absolute-magnitude-predictor.joblib",
+    "luminosity": "luminosity-predictor.joblib",
+    "radius": "radius-predictor.joblib",
+    "spectral-class": "spectral-class-predictor.joblib",
+    "star-color": "star-color-predictor.joblib",
+    "star-type": "star-type-predictor.joblib",
+    "temperature": "temperature-predictor.joblib",
+}
+MMAP_SUFFIX = ".mmap.joblib"
+VERSIONS_DIR = "versions"
+CURRENT_FILE = "CURRENT"
+
+
+def release_dir(model_dir, release):
+    return os.path.join(model_dir, VERSIONS_DIR, release)
+
+
+def current_release(model_dir):
+    try:
+        with open(os.path.join(model_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def current_model_dir(model_dir):
+    # Without a CURRENT pointer the flat layout of `models/` is served, as before releases existed
+    release = current_release(model_dir)
+    return release_dir(model_dir, release) if release else model_dir
+
+
+def publish_release(model_dir, release):
+    if not os.path.isdir(release_dir(model_dir, release)):
+        raise FileNotFoundError(f"Release '{release}' does not exist")
+    # Renaming over the old pointer is atomic, so readers see either the old or the new release
+    tmp_path = os.path.join(model_dir, CURRENT_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        f.write(release)
+    os.replace(tmp_path, os.path.join(model_dir, CURRENT_FILE))
+
+
+def estimate_size(obj, _seen=None):
+    # Walks the object graph and sums array buffers; sklearn's Cython `Tree` exposes its arrays through __getstate__
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+
+    if type(obj).__name__ == "Tree" and hasattr(obj, "__getstate__"):
+        state = obj.__getstate__()
+        return sys.getsizeof(obj) + sum(value.nbytes for value in state.values() if isinstance(value, np.ndarray))
+
+    if isinstance(obj, dict):
+        children = [*obj.keys(), *obj.values()]
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        children = obj
+    elif hasattr(obj, "__dict__"):
+        children = [vars(obj)]
+    else:
+        children = ()
+
+    return sys.getsizeof(obj) + sum(estimate_size(child, seen) for child in children)
+
+
+class ModelRegistry:
+    def __init__(self, model_dir=MODEL_DIR, filenames=None, max_models=None, memory_budget=None, compile=False, check_interval=1.0):
+        self.model_dir = model_dir
+        self.filenames = dict(filenames or MODEL_FILES)
+        self.max_models = max_models
+        self.memory_budget = memory_budget
+        self.compile = compile
+        self.check_interval = check_interval
+
+        self._models = OrderedDict()
+        self._locations = {}
+        self._compiled = {}
+        self._lock = threading.Lock()
+        self._load_locks = {key: threading.Lock() for key in self.filenames}
+        self._reloading = set()
+        self._watcher = None
+        self._release = self.release()
+        self._release_callbacks = []
+        self._stats = {
+            key: {"loaded": False, "mmap": False, "loads": 0, "reloads": 0, "hits": 0, "evictions": 0, "load_seconds": None, "size_bytes": None}
+            for key in self.filenames
+        }
+
+    def __contains__(self, key):
+        return key in self.filenames
+
+    def __getitem__(self, key):
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def keys(self):
+        return self.filenames.keys()
+
+    def release(self):
+        return current_release(self.model_dir)
+
+    def path(self, key):
+        return self.locate(key)[0]
+
+    def version(self, key):
+        # Changes whenever the artifact on disk is replaced, e.g. by re-running model-training.py
+        return self.locate(key)[1]
+
+    def locate(self, key, max_age=0):
+        # (artifact path, version) of a model, read from disk unless the last look is at most `max_age` seconds old;
+        # CURRENT is read once per look
+        now = time.monotonic()
+        with self._lock:
+            cached = self._locations.get(key)
+        if cached is not None and now - cached[0] < max_age:
+            return cached[1], cached[2]
+
+        release = self.release()
+        # Uncompressed '*.mmap.joblib' artifacts take precedence over the compressed ones
+        full_path = os.path.join(release_dir(self.model_dir, release) if release else self.model_dir, self.filenames[key])
+        mmap_path = full_path.replace(".joblib", MMAP_SUFFIX)
+        try:
+            stat = os.stat(mmap_path)
+            full_path = mmap_path
+        except OSError:
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                stat = None
+
+        version = None
+        if stat is not None:
+            version = f"{release}/{stat.st_mtime_ns}-{stat.st_size}" if release else f"{stat.st_mtime_ns}-{stat.st_size}"
+        with self._lock:
+            self._locations[key] = (now, full_path, version)
+        return full_path, version
+
+    def get(self, key, default=None):
+        if key not in self.filenames:
+            return default
+
+        # The hot path: the files are looked at again only every `check_interval` seconds
+        version = self.locate(key, self.check_interval)[1]
+        with self._lock:
+            if key in self._models:
+                # A new artifact is loaded in the background; until it is swapped in, the current one keeps serving
+                if self._models[key]["version"] != version and version is not None:
+                    self._reload_in_background(key)
+                self._models.move_to_end(key)
+                self._stats[key]["hits"] += 1
+                return self._models[key]
+
+        # Only one thread loads a given file; the others wait and then reuse its result
+        with self._load_locks[key]:
+            with self._lock:
+                if key in self._models:
+                    self._stats[key]["hits"] += 1
+                    return self._models[key]
+
+            entry = self.load(key)
+            if entry is None:
+                return default
+
+            with self._lock:
+                self._models[key] = entry
+                self._evict(keep=key)
+
+        self._check_release()
+        return entry
+
+    def load(self, key):
+        full_path, version = self.locate(key)
+        mmap_mode = "r" if full_path.endswith(MMAP_SUFFIX) else None
+        start_time = perf_counter()
+        try:
+            model_tuple = joblib.load(full_path, mmap_mode=mmap_mode)
+            if not (isinstance(model_tuple, tuple) and len(model_tuple) == 2):
+                raise ValueError("Model file format invalid (expected tuple)")
+        except Exception as e:
+            print(f"[ERROR] Failed to load model for '{key}': {e}")
+            return None
+
+        entry = {"model": model_tuple[0], "features": model_tuple[1], "version": version}
+        if self.compile:
+            entry["compiled"] = compile_pipeline(*model_tuple)
+
+        load_seconds = perf_counter() - start_time
+        size_bytes = estimate_size(entry)
+
+        with self._lock:
+            stats = self._stats[key]
+            stats.update(loaded=True, load_seconds=load_seconds, size_bytes=size_bytes, mmap=mmap_mode is not None)
+            stats["loads"] += 1
+
+        print(f"[INFO] Loaded model for '{key}' in {load_seconds:.2f}s ({size_bytes / 1e6:.1f} MB)")
+        return entry
+
+    def reload(self, keys=None):
+        # Swaps in new versions of the loaded models; returns the keys that changed
+        with self._lock:
+            keys = [key for key in (keys or list(self._models)) if key in self._models]
+
+        swapped = []
+        for key in keys:
+            with self._load_locks[key]:
+                with self._lock:
+                    current = self._models.get(key)
+                if current is None or current["version"] == self.version(key):
+                    continue
+
+                entry = self.load(key)
+                if entry is None:
+                    continue
+
+                with self._lock:
+                    if key in self._models:
+                        self._models[key] = entry
+                        self._compiled.pop(key, None)
+                        self._stats[key]["reloads"] += 1
+                        swapped.append(key)
+                        print(f"[INFO] Swapped in model '{key}' version {entry['version']}")
+
+        self._check_release()
+        return swapped
+
+    def on_release(self, callback):
+        # `callback(release)` runs in the thread that first serves a new release (loads or swaps in its models)
+        self._release_callbacks.append(callback)
+
+    def _check_release(self):
+        release = self.release()
+        with self._lock:
+            if release == self._release:
+                return
+            self._release = release
+
+        for callback in self._release_callbacks:
+            try:
+                callback(release)
+            except Exception as e:
+                print(f"[ERROR] Release callback failed for '{release}': {e}")
+
+    def watch(self, interval):
+        # Polls the CURRENT pointer and the artifacts, so new releases are picked up without any request;
+        # starts one thread per process, and is cheap to call again once it runs
+        watcher = self._watcher
+        if watcher is not None and watcher[1] == os.getpid():
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"[ERROR] Model watcher failed: {e}")
+
+        with self._lock:
+            if self._watcher is None or self._watcher[1] != os.getpid():
+                self._watcher = (threading.Thread(target=run, name="model-watcher", daemon=True), os.getpid())
+                self._watcher[0].start()
+
+    def _reload_in_background(self, key):
+        # Called with self._lock held; at most one reload per model runs at a time
+        if key in self._reloading:
+            return
+        self._reloading.add(key)
+
+        def run():
+            try:
+                self.reload([key])
+            finally:
+                with self._lock:
+                    self._reloading.discard(key)
+
+        threading.Thread(target=run, name=f"reload-{key}", daemon=True).start()
+
+    def compiled(self, key, entry):
+        # The fast-path pipeline of `entry`, compiled on first use when models are not compiled on load;
+        # None if the pipeline cannot be compiled
+        if entry.get("compiled") is not None:
+            return entry["compiled"]
+
+        with self._lock:
+            cached = self._compiled.get(key)
+        if cached is not None and cached[0] == entry["version"]:
+            return cached[1]
+
+        compiled = compile_pipeline(entry["model"], entry["features"])
+        size_bytes = estimate_size(compiled) if compiled is not None else 0
+        with self._lock:
+            # Kept only while `entry` is the resident version, and counted in its size for the memory budget
+            if self._models.get(key) is entry:
+                self._compiled[key] = (entry["version"], compiled)
+                self._stats[key]["size_bytes"] = (self._stats[key]["size_bytes"] or 0) + size_bytes
+                self._evict(keep=key)
+        return compiled
+
+    def warm_up(self, keys, compiled=False):
+        # With `compiled`, the fast-path pipelines are built here too, e.g. before Gunicorn forks its workers
+        keys = list(self.filenames) if "all" in keys else keys
+        for key in keys:
+            if key not in self.filenames:
+                print(f"[ERROR] Cannot warm up unknown model '{key}'")
+                continue
+            entry = self.get(key)
+            if compiled and entry is not None:
+                self.compiled(key, entry)
+
+    def unload(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._stats.items()}
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(self._stats[key]["size_bytes"] or 0 for key in self._models)
+
+    def _evict(self, keep):
+        # Called with self._lock held; least recently used models go first, the one just loaded always stays
+        def over_budget():
+            if self.max_models is not None and len(self._models) > self.max_models:
+                return True
+            if self.memory_budget is not None:
+                return sum(self._stats[key]["size_bytes"] or 0 for key in self._models) > self.memory_budget
+            return False
+
+        while over_budget():
+            victim = next((key for key in self._models if key != keep), None)
+            if victim is None:
+                break
+            self._drop(victim)
+            self._stats[victim]["evictions"] += 1
+
+    def _drop(self, key):
+        self._compiled.pop(key, None)
+        if self._models.pop(key, None) is not None:
+            self._stats[key]["loaded"] = False
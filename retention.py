@@ -0,0 +1,105 @@
+"""
+    Retention of the prediction history.
+
+    Rows older than the retention period are streamed, in id order, to a gzip-compressed JSON-lines archive
+    (`ARCHIVE_DIR/predictions-<timestamp>.jsonl.gz`), removed with one DELETE, and the history summaries of the
+    affected users are rebuilt. Afterwards the database file is compacted with VACUUM, or with SQLite's
+    incremental vacuum, which frees pages in small steps without rewriting the whole file.
+
+        python retention.py --days 180 --vacuum incremental
+
+"""
+
+import os
+import gzip
+import json
+import argparse
+from datetime import datetime, timedelta
+from pytz import timezone
+from sqlalchemy import select, text
+from models import db, Prediction
+from summary import rebuild_summaries
+
+
+IST = timezone('Asia/Kolkata')
+ARCHIVE_DIR = "archive"
+ARCHIVE_BATCH_SIZE = 5000
+INCREMENTAL_VACUUM_PAGES = 10000
+
+
+def archive_predictions(cutoff, archive_dir=ARCHIVE_DIR, batch_size=ARCHIVE_BATCH_SIZE):
+    # Returns (rows archived, archive path); nothing is deleted unless the archive was written completely
+    table = Prediction.__table__
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"predictions-{datetime.now(IST).strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+
+    archived, last_id, users = 0, 0, set()
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+        while True:
+            rows = db.session.execute(
+                select(table).where(table.c.prediction_time < cutoff, table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+            ).mappings().all()
+            if not rows:
+                break
+            for row in rows:
+                f.write(json.dumps(dict(row), default=lambda value: value.isoformat()) + "\n")
+                users.add(row["user_id"])
+            archived += len(rows)
+            last_id = rows[-1]["id"]
+
+    if not archived:
+        os.remove(path + ".tmp")
+        return 0, None
+    os.replace(path + ".tmp", path)
+
+    # Bounded by the last archived id too, so a row that was never written to the archive is never deleted
+    db.session.execute(table.delete().where(table.c.prediction_time < cutoff, table.c.id <= last_id))
+    rebuild_summaries(users)
+    return archived, path
+
+
+def vacuum(mode="full", pages=INCREMENTAL_VACUUM_PAGES):
+    if db.engine.dialect.name != "sqlite" or mode == "none":
+        return
+
+    # VACUUM cannot run inside a transaction
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if mode == "incremental":
+            # auto_vacuum=INCREMENTAL only takes effect after one full VACUUM; later runs free pages in steps
+            if connection.execute(text("PRAGMA auto_vacuum")).scalar() != 2:
+                connection.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+                connection.execute(text("VACUUM"))
+            else:
+                connection.execute(text(f"PRAGMA incremental_vacuum({int(pages)})"))
+        else:
+            connection.execute(text("VACUUM"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive and remove old predictions, then compact the database.")
+    parser.add_argument(
+        "--days", type=int, default=int(os.environ.get("PREDICTION_RETENTION_DAYS", 365)),
+        help="Keep predictions of the last DAYS days (default: PREDICTION_RETENTION_DAYS or 365)."
+    )
+    parser.add_argument("--archive-dir", default=os.environ.get("PREDICTION_ARCHIVE_DIR", ARCHIVE_DIR))
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="Rows read from the database at a time.")
+    parser.add_argument(
+        "--vacuum", choices=["full", "incremental", "none"], default="incremental",
+        help="How to give the freed space back (SQLite only)."
+    )
+    args = parser.parse_args()
+
+    from app import app
+
+    with app.app_context():
+        cutoff = datetime.now(IST) - timedelta(days=args.days)
+        archived, path = archive_predictions(cutoff, args.archive_dir, args.batch_size)
+        if archived:
+            print(f"[INFO] Archived and removed {archived} predictions older than {cutoff:%Y-%m-%d} to {path}")
+        else:
+            print(f"[INFO] No predictions older than {cutoff:%Y-%m-%d}")
+        vacuum(args.vacuum)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+    Precomputed schema of the training data: category vocabularies, numeric input ranges and the feature order
+    of every model, saved as `schema.json` by model-training.py next to the model files (`models/`, or the
+    release directory under `models/versions/` once releases are used).
+
+    The web forms and the batch API read it at import instead of parsing the whole training CSV. If the file is
+    missing (e.g. models trained before it existed) it is rebuilt from the CSV once and saved.
+
+"""
+
+import os
+import csv
+import json
+import hashlib
+
+
+SCHEMA_VERSION = 2
+SCHEMA_FILENAME = "schema.json"
+SCHEMA_PATH = os.path.join("models", SCHEMA_FILENAME)
+DATA_PATH = os.path.join("data", "star_data.csv")
+CATEGORICAL_FEATURES = ["Star_Color", "Spectral_Class", "Star_Type"]
+NUMERICAL_FEATURES = ["Temperature", "Radius", "Luminosity", "Absolute_Magnitude"]
+STAR_TYPES = {
+    0: "Brown Dwarf",
+    1: "Red Dwarf",
+    2: "White Dwarf",
+    3: "Main Sequence",
+    4: "Supergiant",
+    5: "Hypergiant"
+}
+# Accepted input ranges of the web form and the batch API, kept as strings so they stay exact Decimals
+INPUT_RANGES = {
+    "Radius": ["0.01", "1000"],
+    "Luminosity": ["0", "1.0e+07"],
+    "Temperature": ["300", "50000"],
+    "Absolute_Magnitude": ["-12", "25"],
+}
+
+
+def build_schema(columns, rows, data_hash):
+    # `rows` yields dicts keyed by column name; only one pass is made over them
+    # Category counts keep first-seen order, like Series.unique()
+    categories = {feature: {} for feature in CATEGORICAL_FEATURES}
+    observed = {feature: [None, None] for feature in NUMERICAL_FEATURES}
+    totals = dict.fromkeys(NUMERICAL_FEATURES, 0.0)
+    count = 0
+
+    for row in rows:
+        count += 1
+        for feature, seen in categories.items():
+            value = str(row[feature]).strip()
+            seen[value] = seen.get(value, 0) + 1
+        for feature, bounds in observed.items():
+            value = float(row[feature])
+            bounds[0] = value if bounds[0] is None else min(bounds[0], value)
+            bounds[1] = value if bounds[1] is None else max(bounds[1], value)
+            totals[feature] += value
+
+    # Starting values for features that are unknown when several are predicted together
+    defaults = {feature: max(seen, key=seen.get) for feature, seen in categories.items() if seen}
+    defaults["Star_Type"] = int(defaults["Star_Type"]) if "Star_Type" in defaults else None
+    defaults.update({feature: total / count if count else None for feature, total in totals.items()})
+
+    return {
+        "version": SCHEMA_VERSION,
+        "data_hash": data_hash,
+        "columns": list(columns),
+        "features": {target: [column for column in columns if column != target] for target in columns},
+        "categories": {
+            **{feature: list(categories[feature]) for feature in ("Star_Color", "Spectral_Class")},
+            "Star_Type": {str(code): name for code, name in STAR_TYPES.items()},
+        },
+        "ranges": INPUT_RANGES,
+        "observed_ranges": observed,
+        "defaults": defaults,
+    }
+
+
+def build_schema_from_csv(path=DATA_PATH, data_hash=None):
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f, skipinitialspace=True)
+        reader.fieldnames = [name.strip() for name in reader.fieldnames]
+        return build_schema(reader.fieldnames, reader, data_hash or file_hash(path))
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_schema(schema, path=SCHEMA_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(schema, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def served_schema_path(model_dir="models"):
+    # The schema of the release being served, so forms and validation match the models; releases trained
+    # before schemas were saved per release fall back to the flat file
+    from registry import current_model_dir
+
+    path = os.path.join(current_model_dir(model_dir), SCHEMA_FILENAME)
+    return path if os.path.exists(path) else os.path.join(model_dir, SCHEMA_FILENAME)
+
+
+def load_schema(path=None, data_path=DATA_PATH):
+    path = path or served_schema_path()
+    try:
+        with open(path) as f:
+            schema = json.load(f)
+        if schema.get("version") == SCHEMA_VERSION:
+            return schema
+        print(f"[INFO] Schema '{path}' has an old format, rebuilding it")
+    except FileNotFoundError:
+        print(f"[INFO] Schema '{path}' not found, building it from '{data_path}'")
+
+    schema = build_schema_from_csv(data_path)
+    try:
+        save_schema(schema, path)
+    except OSError as e:
+        print(f"[ERROR] Cannot save schema to '{path}': {e}")
+    return schema
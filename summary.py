@@ -0,0 +1,198 @@
+"""
+    Incrementally maintained per-user history summaries.
+
+    Every flush that inserts or deletes Prediction rows also updates `PredictionSummary` (counts and the
+    distribution of numeric predictions per predicted feature) and `PredictionValueCount` (counts per predicted
+    category), in the same transaction. The updates are relative (`count = count + n`) upserts, so concurrent
+    writers never lose each other's changes, and the history page reads a handful of summary rows instead of
+    aggregating the user's whole history. `rebuild_summaries` recomputes them from the Prediction table, for
+    existing databases and after set-based changes that bypass the ORM.
+
+"""
+
+from math import sqrt
+from types import SimpleNamespace
+from collections import defaultdict
+from sqlalchemy import case, event, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models import db, Prediction, PredictionSummary, PredictionValueCount, FEATURE_COLUMNS
+
+
+CATEGORICAL_COLUMNS = {"star_color", "spectral_class", "star_type"}
+# Stored predicted_feature names ("Absolute Magnitude") to their typed columns
+PREDICTED_COLUMNS = {feature.replace("_", " "): column for feature, column in FEATURE_COLUMNS.items()}
+
+
+def predicted_value(row):
+    # The predicted value of a row: its category as shown in the history, or a float. None for rows without
+    # a typed value, e.g. the summaries of scored files
+    column = PREDICTED_COLUMNS.get(row.predicted_feature)
+    if column is None or getattr(row, column) is None:
+        return None
+    return str(row.prediction) if column in CATEGORICAL_COLUMNS else float(getattr(row, column))
+
+
+def upsert(connection, table, keys, values, updates):
+    # `updates` builds the SET clause from the current row (table.c) and the new values
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        statement = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(table).values(**keys, **values)
+        connection.execute(statement.on_conflict_do_update(index_elements=list(keys), set_=updates(statement.excluded)))
+        return
+
+    # Other databases: update the row, and insert it when it does not exist yet
+    new = SimpleNamespace(**{name: literal(value, table.c[name].type) for name, value in values.items()})
+    where = [table.c[name] == value for name, value in keys.items()]
+    if connection.execute(table.update().where(*where).values(**updates(new))).rowcount == 0:
+        connection.execute(table.insert().values(**keys, **values))
+
+
+def summary_updates(new):
+    c = PredictionSummary.__table__.c
+    return {
+        "count": c.count + new.count,
+        "value_count": c.value_count + new.value_count,
+        "value_sum": func.coalesce(c.value_sum, 0) + func.coalesce(new.value_sum, 0),
+        "value_sum_squares": func.coalesce(c.value_sum_squares, 0) + func.coalesce(new.value_sum_squares, 0),
+        "value_min": case(
+            (new.value_min.is_(None), c.value_min),
+            (c.value_min.is_(None) | (new.value_min < c.value_min), new.value_min),
+            else_=c.value_min
+        ),
+        "value_max": case(
+            (new.value_max.is_(None), c.value_max),
+            (c.value_max.is_(None) | (new.value_max > c.value_max), new.value_max),
+            else_=c.value_max
+        ),
+    }
+
+
+def value_count_updates(new):
+    return {"count": PredictionValueCount.__table__.c.count + new.count}
+
+
+def collect_changes(session):
+    # Net changes of this flush per (user, feature) and per (user, feature, category)
+    summaries = defaultdict(lambda: {
+        "count": 0, "value_count": 0, "value_sum": None, "value_sum_squares": None, "value_min": None, "value_max": None
+    })
+    value_counts = defaultdict(int)
+    recompute_extremes = set()
+
+    for sign, rows in ((1, session.new), (-1, session.deleted)):
+        for row in rows:
+            if not isinstance(row, Prediction):
+                continue
+            key = (row.user_id, row.predicted_feature)
+            summary = summaries[key]
+            summary["count"] += sign
+
+            value = predicted_value(row)
+            if isinstance(value, str):
+                value_counts[key + (value,)] += sign
+            elif value is not None:
+                summary["value_count"] += sign
+                summary["value_sum"] = (summary["value_sum"] or 0.0) + sign * value
+                summary["value_sum_squares"] = (summary["value_sum_squares"] or 0.0) + sign * value * value
+                if sign > 0:
+                    summary["value_min"] = value if summary["value_min"] is None else min(summary["value_min"], value)
+                    summary["value_max"] = value if summary["value_max"] is None else max(summary["value_max"], value)
+                else:
+                    recompute_extremes.add(key)
+
+    return summaries, value_counts, recompute_extremes
+
+
+@event.listens_for(db.session, "after_flush")
+def update_summaries(session, flush_context):
+    # Runs inside the flush's transaction, so a rolled-back insert or delete rolls back its summary changes too
+    summaries, value_counts, recompute_extremes = collect_changes(session)
+    if not summaries:
+        return
+
+    connection = session.connection()
+    summary_table, value_table = PredictionSummary.__table__, PredictionValueCount.__table__
+    for (user_id, feature), changes in summaries.items():
+        upsert(connection, summary_table, {"user_id": user_id, "predicted_feature": feature}, changes, summary_updates)
+
+    for (user_id, feature, value), change in value_counts.items():
+        if change:
+            upsert(connection, value_table, {"user_id": user_id, "predicted_feature": feature, "value": value}, {"count": change}, value_count_updates)
+
+    # A deleted value may have been the minimum or maximum; only then are they recomputed from the remaining rows
+    for user_id, feature in recompute_extremes:
+        column = getattr(Prediction, PREDICTED_COLUMNS[feature])
+        low, high = connection.execute(
+            select(func.min(column), func.max(column)).where(Prediction.user_id == user_id, Prediction.predicted_feature == feature)
+        ).one()
+        connection.execute(summary_table.update().where(
+            summary_table.c.user_id == user_id, summary_table.c.predicted_feature == feature
+        ).values(value_min=low, value_max=high))
+
+    users = {user_id for user_id, _ in summaries}
+    connection.execute(summary_table.delete().where(summary_table.c.user_id.in_(users), summary_table.c.count <= 0))
+    connection.execute(value_table.delete().where(value_table.c.user_id.in_(users), value_table.c.count <= 0))
+
+
+def rebuild_summaries(user_ids=None):
+    # Recomputes the summaries of the given users (default: everyone) with two INSERT ... SELECT statements
+    summary_table, value_table = PredictionSummary.__table__, PredictionValueCount.__table__
+    for table in (summary_table, value_table):
+        statement = table.delete()
+        if user_ids is not None:
+            statement = statement.where(table.c.user_id.in_(user_ids))
+        db.session.execute(statement)
+
+    numeric = case(
+        {feature: getattr(Prediction, column) for feature, column in PREDICTED_COLUMNS.items() if column not in CATEGORICAL_COLUMNS},
+        value=Prediction.predicted_feature
+    )
+    category = case(
+        {feature: getattr(Prediction, column).isnot(None) for feature, column in PREDICTED_COLUMNS.items() if column in CATEGORICAL_COLUMNS},
+        value=Prediction.predicted_feature,
+        else_=False
+    )
+
+    summaries = select(
+        Prediction.user_id, Prediction.predicted_feature, func.count(Prediction.id), func.count(numeric),
+        func.sum(numeric), func.sum(numeric * numeric), func.min(numeric), func.max(numeric)
+    ).group_by(Prediction.user_id, Prediction.predicted_feature)
+    values = select(
+        Prediction.user_id, Prediction.predicted_feature, Prediction.prediction, func.count(Prediction.id)
+    ).where(category).group_by(Prediction.user_id, Prediction.predicted_feature, Prediction.prediction)
+    if user_ids is not None:
+        summaries = summaries.where(Prediction.user_id.in_(user_ids))
+        values = values.where(Prediction.user_id.in_(user_ids))
+
+    db.session.execute(insert(summary_table).from_select(
+        ["user_id", "predicted_feature", "count", "value_count", "value_sum", "value_sum_squares", "value_min", "value_max"], summaries
+    ))
+    db.session.execute(insert(value_table).from_select(["user_id", "predicted_feature", "value", "count"], values))
+    db.session.commit()
+
+
+def user_summary(user_id):
+    # A few primary-key reads, however long the user's history is
+    summaries = PredictionSummary.query.filter_by(user_id=user_id).order_by(PredictionSummary.predicted_feature).all()
+    value_counts = defaultdict(list)
+    for row in PredictionValueCount.query.filter_by(user_id=user_id).order_by(PredictionValueCount.count.desc()):
+        value_counts[row.predicted_feature].append({"value": row.value, "count": row.count})
+
+    features = []
+    for row in summaries:
+        feature = {"feature": row.predicted_feature, "count": row.count}
+        if row.value_count:
+            mean = row.value_sum / row.value_count
+            feature.update(
+                mean=mean,
+                std=sqrt(max(0.0, row.value_sum_squares / row.value_count - mean * mean)),
+                min=row.value_min,
+                max=row.value_max
+            )
+        if row.predicted_feature in value_counts:
+            # Not "values", which templates would confuse with dict.values for features without categories
+            feature["categories"] = value_counts[row.predicted_feature]
+        features.append(feature)
+
+    return {"total": sum(row.count for row in summaries), "features": features}
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler, PowerTransformer
+from fastpath import CompiledPipeline
+
+
+CATEGORICAL = ["Star_Color", "Spectral_Class"]
+NUMERIC = ["Temperature", "Radius", "Luminosity"]
+FEATURES = CATEGORICAL + NUMERIC
+
+
+def star_rows(n, seed):
+    # Synthetic stars; the values only need to look like the training data, not be physically consistent
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Star_Color": rng.choice(["Red", "Blue", "White", "Yellow"], n),
+        "Spectral_Class": rng.choice(["M", "B", "A", "F", "O"], n),
+        "Temperature": rng.uniform(2000, 40000, n),
+        "Radius": rng.lognormal(0, 2, n),
+        "Luminosity": rng.lognormal(0, 3, n),
+    })
+    df["Star_Type"] = (df["Temperature"] // 7000).astype(int)
+    df["Absolute_Magnitude"] = -2.5 * np.log10(df["Luminosity"]) + rng.normal(0, 0.5, n)
+    return df
+
+
+def build(forest):
+    # Same shape as the pipelines of model-training.py: one transformer per column, then the forest
+    transformers = [(column, Pipeline([("encoder", OneHotEncoder(handle_unknown="ignore"))]), [column]) for column in CATEGORICAL]
+    transformers += [
+        (column, Pipeline([("scaler", StandardScaler()), ("pow_tnfr", PowerTransformer(method="yeo-johnson", standardize=True))]), [column])
+        for column in NUMERIC
+    ]
+    return Pipeline([("preprocessor", ColumnTransformer(transformers)), ("model", forest)])
+
+
+@pytest.fixture(scope="module")
+def data():
+    train, test = star_rows(300, seed=0), star_rows(100, seed=1)
+    # Unseen categories must be ignored exactly like OneHotEncoder(handle_unknown='ignore') does
+    test.loc[:4, "Star_Color"] = "Green"
+    return train, test
+
+
+def per_tree(pipeline, X, method):
+    transformed = pipeline[0].transform(X).astype(np.float32)
+    return np.array([getattr(tree, method)(transformed) for tree in pipeline[-1].estimators_])
+
+
+def test_regressor_matches_sklearn(data):
+    train, test = data
+    pipeline = build(RandomForestRegressor(n_estimators=15, max_depth=6, random_state=0, n_jobs=1))
+    pipeline.fit(train[FEATURES], train["Absolute_Magnitude"])
+    compiled = CompiledPipeline(pipeline, FEATURES)
+
+    expected = pipeline.predict(test[FEATURES])
+    np.testing.assert_array_equal(compiled.predict(test[FEATURES]), expected)
+    assert compiled.predict_one(test.iloc[0][FEATURES].to_dict()) == expected[0]
+
+    trees = per_tree(pipeline, test[FEATURES], "predict")
+    lower, upper = np.quantile(trees, [0.05, 0.95], axis=0)
+    uncertainty = compiled.uncertainty(test[FEATURES], level=0.9)
+    np.testing.assert_array_equal([u["prediction"] for u in uncertainty], expected)
+    np.testing.assert_array_equal([u["std"] for u in uncertainty], trees.std(axis=0))
+    np.testing.assert_array_equal([u["lower"] for u in uncertainty], lower)
+    np.testing.assert_array_equal([u["upper"] for u in uncertainty], upper)
+
+
+def test_classifier_matches_sklearn(data):
+    train, test = data
+    pipeline = build(RandomForestClassifier(n_estimators=15, max_depth=6, random_state=0, n_jobs=1))
+    pipeline.fit(train[FEATURES], train["Star_Type"])
+    compiled = CompiledPipeline(pipeline, FEATURES)
+
+    expected = pipeline.predict(test[FEATURES])
+    proba = pipeline.predict_proba(test[FEATURES])
+    np.testing.assert_array_equal(compiled.predict(test[FEATURES]), expected)
+    np.testing.assert_array_equal(compiled.predict_proba(test[FEATURES]), proba)
+
+    trees = per_tree(pipeline, test[FEATURES], "predict_proba")
+    best = np.argmax(proba, axis=1)
+    rows = np.arange(len(test))
+    uncertainty = compiled.uncertainty(test[FEATURES])
+    np.testing.assert_array_equal([u["prediction"] for u in uncertainty], expected)
+    np.testing.assert_array_equal([u["confidence"] for u in uncertainty], proba[rows, best])
+    np.testing.assert_allclose([u["std"] for u in uncertainty], trees[:, rows, best].std(axis=0), rtol=0, atol=1e-12)
+    for u, row in zip(uncertainty, proba):
+        np.testing.assert_array_equal(list(u["probabilities"].values()), row)
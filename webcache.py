@@ -0,0 +1,147 @@
+"""
+    HTTP caching of the static pages and of the files under `static/`.
+
+    `PageCache` keeps the rendered HTML of pages that only depend on the login state (home, about, prediction
+    options), together with a strong ETag and gzip / brotli versions compressed once. Browsers revalidate with
+    If-None-Match and get a 304 without the page being rendered or sent again.
+
+    `StaticAssets` serves `static/` from memory with the same precompression. `url_for('static', ...)` adds a
+    content fingerprint (`?v=<hash>`) to every URL, and fingerprinted requests are cached by browsers for a year,
+    since a changed file gets a new URL.
+
+"""
+
+import os
+import gzip
+import hashlib
+import mimetypes
+import threading
+from flask import Response, abort
+from werkzeug.utils import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# Smaller bodies do not get smaller by compressing them
+MIN_COMPRESS_BYTES = 512
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+
+def compress(body):
+    encodings = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encodings["br"] = brotli.compress(body, quality=11)
+    return encodings
+
+
+def encoded_response(request, body, mimetype, etag, encodings):
+    encoding = next((name for name in ("br", "gzip") if name in encodings and request.accept_encodings[name]), None)
+    response = Response(encodings[encoding] if encoding else body, mimetype=mimetype)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    # Each encoding is a different representation, so each gets its own strong ETag
+    response.set_etag(f"{etag}-{encoding}" if encoding else etag)
+    return response.make_conditional(request)
+
+
+class PageCache:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+
+        self._pages = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def render(self, request, key, render):
+        # `render` returns the HTML of the page; it is only called the first time a key is requested
+        if not self.enabled:
+            return render()
+
+        with self._lock:
+            page = self._pages.get(key)
+            self._stats["hits" if page else "misses"] += 1
+
+        if page is None:
+            body = render().encode("utf-8")
+            page = (body, hashlib.sha256(body).hexdigest()[:16], compress(body) if len(body) >= MIN_COMPRESS_BYTES else {})
+            with self._lock:
+                self._pages[key] = page
+
+        body, etag, encodings = page
+        response = encoded_response(request, body, "text/html", etag, encodings)
+        # The page depends on the login cookie, so it must not be stored by shared caches and is revalidated each time
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+
+        if response.status_code == 304:
+            with self._lock:
+                self._stats["not_modified"] += 1
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "enabled": self.enabled, "pages": len(self._pages)}
+
+
+class StaticAssets:
+    def __init__(self, folder, max_age=STATIC_MAX_AGE):
+        self.folder = folder
+        self.max_age = max_age
+
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, filename):
+        entry = self._load(filename)
+        return entry["fingerprint"] if entry else None
+
+    def response(self, request, filename):
+        entry = self._load(filename)
+        if entry is None:
+            abort(404)
+
+        response = encoded_response(request, entry["body"], entry["mimetype"], entry["fingerprint"], entry["encodings"])
+        if request.args.get("v") == entry["fingerprint"]:
+            # The URL changes whenever the content does, so this response never goes stale
+            response.cache_control.public = True
+            response.cache_control.max_age = self.max_age
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+    def _load(self, filename):
+        # Files are read and compressed once, and again only when their modification time changes
+        path = safe_join(self.folder, filename)
+        if path is None or not os.path.isfile(path):
+            return None
+
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            entry = self._files.get(path)
+        if entry is not None and entry["mtime"] == mtime:
+            return entry
+
+        with open(path, "rb") as f:
+            body = f.read()
+        mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        compressible = mimetype.startswith(COMPRESSIBLE_TYPES) and len(body) >= MIN_COMPRESS_BYTES
+        entry = {
+            "mtime": mtime,
+            "fingerprint": hashlib.sha256(body).hexdigest()[:12],
+            "mimetype": mimetype,
+            "body": body,
+            "encodings": compress(body) if compressible else {},
+        }
+        with self._lock:
+            self._files[path] = entry
+        return entry
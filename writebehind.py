@@ -0,0 +1,123 @@
+"""
+    Optional write-behind queue for Prediction rows.
+
+    Instead of one `db.session.commit()` (and one fsync) per `/predict` request, rows are queued and inserted by a
+    background thread in batched transactions, flushed once `flush_size` rows are waiting or every `flush_interval`
+    seconds. Pending rows are flushed on `close()`, which runs at interpreter exit and in Gunicorn's worker_exit hook.
+
+"""
+
+import os
+import atexit
+import threading
+from time import monotonic
+from collections import deque
+from models import db
+
+
+class PredictionWriter:
+    def __init__(self, app, enabled=False, flush_size=100, flush_interval=1.0):
+        self.app = app
+        self.enabled = enabled
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stats = {"queued": 0, "written": 0, "failed": 0, "batches": 0, "last_flush_seconds": None}
+
+        atexit.register(self.close)
+
+    def add(self, row):
+        if not self.enabled:
+            db.session.add(row)
+            db.session.commit()
+            return
+
+        self._ensure_started()
+        with self._lock:
+            self._pending.append(row)
+            self._stats["queued"] += 1
+            full = len(self._pending) >= self.flush_size
+
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        # Safe to call from request threads, e.g. before reading history so users see their own rows
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._pending)
+                self._pending.clear()
+
+            if not rows:
+                return 0
+
+            start_time = monotonic()
+            with self.app.app_context():
+                try:
+                    db.session.add_all(rows)
+                    db.session.commit()
+                    written = len(rows)
+                except Exception as e:
+                    # One bad row must not lose the whole batch: retry the rows one by one
+                    db.session.rollback()
+                    print(f"[ERROR] Batched insert of {len(rows)} predictions failed, retrying one by one: {e}")
+                    written = self._write_each(rows)
+
+            with self._lock:
+                self._stats["written"] += written
+                self._stats["failed"] += len(rows) - written
+                self._stats["batches"] += 1
+                self._stats["last_flush_seconds"] = monotonic() - start_time
+
+            return written
+
+    def close(self):
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None and self._pid == os.getpid() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=max(self.flush_interval, 1.0) * 5)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "enabled": self.enabled, "pending": len(self._pending)}
+
+    def _write_each(self, rows):
+        written = 0
+        for row in rows:
+            try:
+                db.session.add(row)
+                db.session.commit()
+                written += 1
+            except Exception as e:
+                db.session.rollback()
+                print(f"[ERROR] Dropping prediction for user {row.user_id}: {e}")
+        return written
+
+    def _ensure_started(self):
+        # With Gunicorn's preload_app the writer is created in the master, whose threads do not survive the fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="prediction-writer", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[ERROR] Prediction writer flush failed: {e}")